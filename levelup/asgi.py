@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'levelup.settings')
+# Lets the settings pick connection defaults that suit ASGI (no persistent connections)
+os.environ.setdefault('LEVELUP_SERVER', 'asgi')
 
 application = get_asgi_application()
@@ -0,0 +1,35 @@
+"""
+URL configuration used under ASGI.
+
+The hot read endpoints are served by the async views in levelupapi.views.asynchronous;
+any other method on the same paths, and every other path, goes to the regular DRF views
+in levelup.urls. /events/stream (roster changes as Server-Sent Events) only exists here.
+"""
+from asgiref.sync import sync_to_async
+from django.urls import path, resolve
+from django.views.decorators.csrf import csrf_exempt
+from levelupapi.views import asynchronous
+from levelup.urls import urlpatterns as sync_urlpatterns
+
+
+def hot_path(async_view, methods=('GET', 'HEAD')):
+    """Serves methods with async_view and hands every other method to the DRF view of the same path"""
+
+    @csrf_exempt
+    async def view(request, *args, **kwargs):
+        if request.method in methods:
+            return await async_view(request, *args, **kwargs)
+        match = resolve(request.path_info, urlconf='levelup.urls')
+        return await sync_to_async(match.func)(request, *match.args, **match.kwargs)
+
+    return view
+
+
+urlpatterns = [
+    path('events', hot_path(asynchronous.event_list)),
+    path('events/stream', hot_path(asynchronous.event_stream, methods=('GET',))),
+    path('events/<int:pk>', hot_path(asynchronous.event_retrieve)),
+    path('games', hot_path(asynchronous.game_list)),
+    path('games/<int:pk>', hot_path(asynchronous.game_retrieve)),
+    path('checkuser', hot_path(asynchronous.check_user, methods=('POST',))),
+] + sync_urlpatterns
@@ -10,7 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -48,9 +50,13 @@ CORS_ORIGIN_WHITELIST = (
     'http://localhost:3000',
     'http://127.0.0.1:3000'
 )
+# The client reads ETags (list revalidation, edit versions) and sends If-Match with edits
+CORS_ALLOW_HEADERS = (*default_headers, 'if-match', 'if-none-match')
+CORS_EXPOSE_HEADERS = ('ETag',)
 
 # UPDATED THIS
 MIDDLEWARE = [
+    'levelupapi.middleware.QueryTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -61,7 +67,49 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'levelup.urls'
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'levelupapi.authentication.GamerAuthentication',
+    ],
+}
+
+# In-process cache of uid -> gamer lookups used by GamerAuthentication
+LEVELUP_GAMER_CACHE_SIZE = 1024
+LEVELUP_GAMER_CACHE_TTL = 300  # seconds
+
+# Share of requests QueryTimingMiddleware measures (0 to 1), and how many times one request
+# must repeat a statement to be logged as a likely N+1
+LEVELUP_METRICS_SAMPLE_RATE = float(os.environ.get('LEVELUP_METRICS_SAMPLE_RATE', 1.0 if DEBUG else 0.05))
+LEVELUP_METRICS_DUPLICATE_THRESHOLD = 3
+
+# Rows serialized at a time by the ?export= streams of the list endpoints
+LEVELUP_EXPORT_CHUNK_SIZE = 2000
+
+# Under ASGI the hot read endpoints are served by async views (see levelup/asgi_urls.py)
+LEVELUP_ASYNC_VIEWS = os.environ.get(
+    'LEVELUP_ASYNC_VIEWS', '1' if os.environ.get('LEVELUP_SERVER') == 'asgi' else '0') == '1'
+
+# Seconds a gamer's cached dashboard may show counts (and others' edits) that changed since it was built
+LEVELUP_DASHBOARD_TTL = 60
+
+# Backend of /search (see levelupapi/search.py); empty picks FTS5 on sqlite and LIKE elsewhere
+LEVELUP_SEARCH_BACKEND = os.environ.get('LEVELUP_SEARCH_BACKEND', '')
+
+# DELETE /events/<pk> and /games/<pk> only mark the rows deleted when they'd remove at least this
+# many events and memberships, leaving them to the purge_deleted command (see levelupapi/deletion.py).
+# Empty always deletes right away
+LEVELUP_SOFT_DELETE_THRESHOLD = int(os.environ.get('LEVELUP_SOFT_DELETE_THRESHOLD') or 0) or None
+
+# Roster changes pushed by /events/stream under ASGI (see levelupapi/roster.py). The default broker
+# only reaches the streams of its own process; levelupapi.roster.CacheBroker relays them between
+# workers through the shared cache (LEVELUP_CACHE_BACKEND=file or a cache server)
+LEVELUP_ROSTER_BROKER = os.environ.get('LEVELUP_ROSTER_BROKER', 'levelupapi.roster.LocalBroker')
+LEVELUP_ROSTER_HEARTBEAT = 15  # seconds between keepalive comments on idle streams
+LEVELUP_ROSTER_QUEUE_SIZE = 100  # messages a slow stream may fall behind before it's told to resync
+LEVELUP_ROSTER_POLL_INTERVAL = 1.0  # seconds, CacheBroker
+LEVELUP_ROSTER_MESSAGE_TTL = 60  # seconds, CacheBroker
+
+ROOT_URLCONF = 'levelup.asgi_urls' if LEVELUP_ASYNC_VIEWS else 'levelup.urls'
 
 TEMPLATES = [
     {
@@ -85,13 +133,92 @@ WSGI_APPLICATION = 'levelup.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# The database is configured from the environment:
+#   LEVELUP_DB_ENGINE              sqlite (default), postgresql, mysql or a dotted backend path
+#   LEVELUP_DB_NAME                database name, or the file path for sqlite
+#   LEVELUP_DB_USER / _PASSWORD / _HOST / _PORT
+#   LEVELUP_DB_CONN_MAX_AGE        seconds to keep connections open between requests
+#   LEVELUP_DB_CONN_HEALTH_CHECKS  check persistent connections before reusing them (default on)
+#   LEVELUP_DB_POOL                use psycopg's connection pool (postgresql, Django 5.1+)
+#   LEVELUP_SQLITE_BUSY_TIMEOUT    seconds a sqlite writer waits for the lock before failing
+#
+# Under ASGI every request may run on a different thread, so persistent connections are
+# never reused and just pile up; levelup/asgi.py sets LEVELUP_SERVER=asgi to default them off.
+# Use LEVELUP_DB_POOL instead for postgresql behind ASGI.
+
+DB_ENGINES = {
+    'sqlite': 'django.db.backends.sqlite3',
+    'postgresql': 'django.db.backends.postgresql',
+    'mysql': 'django.db.backends.mysql',
+}
+
+DB_ENGINE = DB_ENGINES.get(
+    os.environ.get('LEVELUP_DB_ENGINE', 'sqlite'),
+    os.environ.get('LEVELUP_DB_ENGINE'),
+)
+
+ASGI = os.environ.get('LEVELUP_SERVER') == 'asgi'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'ENGINE': DB_ENGINE,
+        'NAME': os.environ.get('LEVELUP_DB_NAME', BASE_DIR / 'db.sqlite3'),
+        'USER': os.environ.get('LEVELUP_DB_USER', ''),
+        'PASSWORD': os.environ.get('LEVELUP_DB_PASSWORD', ''),
+        'HOST': os.environ.get('LEVELUP_DB_HOST', ''),
+        'PORT': os.environ.get('LEVELUP_DB_PORT', ''),
+        'CONN_MAX_AGE': int(os.environ.get('LEVELUP_DB_CONN_MAX_AGE', 0 if ASGI else 60)),
+        'CONN_HEALTH_CHECKS': os.environ.get('LEVELUP_DB_CONN_HEALTH_CHECKS', '1') == '1',
+        'OPTIONS': {},
     }
 }
 
+if DB_ENGINE == DB_ENGINES['sqlite']:
+    # sqlite3.connect(timeout=...) is sqlite's busy_timeout: writers queue for the lock instead
+    # of failing with "database is locked" during signup bursts. WAL mode, which lets readers
+    # run alongside the writer, is switched on per connection in levelupapi.signals.
+    DATABASES['default']['OPTIONS']['timeout'] = int(os.environ.get('LEVELUP_SQLITE_BUSY_TIMEOUT', 20))
+    # sqlite ignores SELECT ... FOR UPDATE: starting transactions with BEGIN IMMEDIATE takes the write
+    # lock up front instead, so a signup reading the free seats (levelupapi.seating) holds it until it
+    # commits rather than failing to upgrade its read lock when another signup wrote in between.
+    DATABASES['default']['OPTIONS']['transaction_mode'] = 'IMMEDIATE'
+elif DB_ENGINE == DB_ENGINES['postgresql'] and os.environ.get('LEVELUP_DB_POOL') == '1':
+    # Django manages pooled connections itself, so persistent connections must be off
+    DATABASES['default']['OPTIONS']['pool'] = True
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+
+# PRAGMAs run on every new sqlite connection
+LEVELUP_SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# LEVELUP_CACHE_BACKEND picks the backend: locmem (default, per process), file, or any dotted
+# backend path such as django.core.cache.backends.redis.RedisCache for multi-worker deployments.
+# With the locmem default, check --deploy warns (levelupapi.W001, see levelupapi/checks.py).
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS.get(
+            os.environ.get('LEVELUP_CACHE_BACKEND', 'locmem'),
+            os.environ.get('LEVELUP_CACHE_BACKEND'),
+        ),
+        'LOCATION': os.environ.get('LEVELUP_CACHE_LOCATION', 'levelup'),
+        'TIMEOUT': int(os.environ.get('LEVELUP_CACHE_TIMEOUT', 3600)),
+    }
+}
+
+# The cache alias used for API response caching
+LEVELUP_CACHE_ALIAS = 'default'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -18,7 +18,7 @@ from django.contrib import admin
 from django.urls import path
 from django.conf.urls import include
 from rest_framework import routers
-from levelupapi.views import register_user, check_user, GameTypeView, EventView, GameView
+from levelupapi.views import register_user, check_user, metrics_view, dashboard_view, search_view, GameTypeView, EventView, GameView
 
 router = routers.DefaultRouter(trailing_slash=False)
 router.register(r'gametypes', GameTypeView, 'gametype')
@@ -30,4 +30,7 @@ urlpatterns = [
     path('', include(router.urls)),
     path('register', register_user),
     path('checkuser', check_user),
+    path('metrics', metrics_view),
+    path('dashboard', dashboard_view),
+    path('search', search_view),
 ]
@@ -12,5 +12,6 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'levelup.settings')
+os.environ.setdefault('LEVELUP_SERVER', 'wsgi')
 
 application = get_wsgi_application()
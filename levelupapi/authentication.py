@@ -0,0 +1,118 @@
+"""Resolves the gamer behind the uid sent in the Authorization header"""
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.db import router
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import NotAuthenticated
+from levelupapi.models import Gamer
+
+
+class LRUCache:
+    """
+    A small thread-safe mapping that keeps at most `maxsize` entries, evicting the least
+    recently used one first, and forgets entries older than `ttl` seconds.
+    """
+
+    def __init__(self, maxsize, ttl, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Returns the value stored for key, or default when it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires <= self.timer():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Stores value for key, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[key] = (self.timer() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Forgets key if it is stored"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Forgets every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+gamer_cache = LRUCache(
+    maxsize=getattr(settings, 'LEVELUP_GAMER_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'LEVELUP_GAMER_CACHE_TTL', 300),
+)
+"""
+Maps uids to the (id, uid, bio) row of their gamer. Only gamers that exist are cached, so a uid
+that registers is never stuck behind a cached miss. Entries are dropped when a Gamer is saved
+or deleted (see levelupapi.signals).
+"""
+
+
+def get_gamer(uid):
+    """
+    Returns the Gamer with the given uid, or None if there isn't one.
+    Every call returns a fresh instance, so callers can't leak changes into the cache.
+    """
+    if not uid:
+        return None
+    row = gamer_cache.get(uid)
+    if row is None:
+        row = Gamer.objects.filter(uid=uid).values_list('id', 'uid', 'bio').first()
+        if row is None:
+            return None
+        gamer_cache.set(uid, row)
+    return Gamer.from_db(router.db_for_read(Gamer), ['id', 'uid', 'bio'], row)
+
+
+async def aget_gamer(uid):
+    """The same as get_gamer(), querying with the async ORM on a cache miss"""
+    if not uid:
+        return None
+    row = gamer_cache.get(uid)
+    if row is None:
+        row = await Gamer.objects.filter(uid=uid).values_list('id', 'uid', 'bio').afirst()
+        if row is None:
+            return None
+        gamer_cache.set(uid, row)
+    return Gamer.from_db(router.db_for_read(Gamer), ['id', 'uid', 'bio'], row)
+
+
+def current_gamer(request):
+    """Returns the gamer that made request, or raises NotAuthenticated if the uid isn't registered"""
+    if isinstance(request.user, Gamer):
+        return request.user
+    raise NotAuthenticated()
+
+
+class GamerAuthentication(BaseAuthentication):
+    """
+    Authenticates requests whose Authorization header holds the uid of a registered gamer.
+    DRF runs this at most once per request and stores the gamer as request.user.
+    Requests with a missing or unknown uid stay anonymous, so /checkuser and /register keep working.
+    """
+
+    def authenticate(self, request):
+        gamer = get_gamer(request.META.get('HTTP_AUTHORIZATION'))
+        if gamer is None:
+            return None
+        return (gamer, gamer.uid)
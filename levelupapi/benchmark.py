@@ -0,0 +1,101 @@
+"""Helpers shared by the benchmark management commands"""
+import contextlib
+import datetime
+import os
+import random
+import statistics
+import tempfile
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from levelupapi.models import Event, EventGamer, Game, Gamer, GameType
+from levelupapi.search import get_backend
+
+
+@contextlib.contextmanager
+def benchmark_database():
+    """
+    Runs the block against a freshly migrated throwaway database, so benchmarks never touch
+    real data. SQLite gets a temporary file rather than the usual in-memory test database,
+    so every benchmark thread can open its own connection to it.
+    """
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    with tempfile.TemporaryDirectory() as directory:
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+
+def seed(gamers=100, game_types=10, games=500, events=2000, attendees=5, seed_value=0):
+    """
+    Bulk inserts a reproducible data set: gamers, game types, games owned by random gamers,
+    events of random games and up to `attendees` distinct gamers joined to each event.
+    Returns the uid of a gamer to send requests as.
+    """
+    rng = random.Random(seed_value)
+    Gamer.objects.bulk_create(
+        [Gamer(uid=f'bench-{i}', bio=f'Gamer {i}') for i in range(gamers)], batch_size=500)
+    GameType.objects.bulk_create(
+        [GameType(label=f'Type {i}') for i in range(game_types)], batch_size=500)
+    gamer_ids = list(Gamer.objects.values_list('id', flat=True))
+    game_type_ids = list(GameType.objects.values_list('id', flat=True))
+
+    Game.objects.bulk_create([
+        Game(
+            game_type_id=rng.choice(game_type_ids),
+            gamer_id=rng.choice(gamer_ids),
+            title=f'Game {i}',
+            maker=f'Maker {i % 20}',
+            number_of_players=rng.randint(2, 8),
+            skill_level=rng.randint(1, 5),
+        )
+        for i in range(games)
+    ], batch_size=500)
+    game_ids = list(Game.objects.values_list('id', flat=True))
+
+    start = datetime.date(2023, 1, 1)
+    Event.objects.bulk_create([
+        Event(
+            game_id=rng.choice(game_ids),
+            organizer_id=rng.choice(gamer_ids),
+            description=f'Event {i}',
+            date=start + datetime.timedelta(days=rng.randint(0, 730)),
+            time=datetime.time(rng.randint(8, 22), rng.choice((0, 30))),
+        )
+        for i in range(events)
+    ], batch_size=500)
+
+    memberships = []
+    for event_id in Event.objects.values_list('id', flat=True):
+        for gamer_id in rng.sample(gamer_ids, min(attendees, len(gamer_ids))):
+            memberships.append(EventGamer(event_id=event_id, gamer_id=gamer_id))
+    EventGamer.objects.bulk_create(memberships, batch_size=500)
+    # bulk_create bypasses the signals that maintain the stored counters and the search index
+    Game.objects.recount_events()
+    Event.objects.recount_attendees()
+    get_backend().rebuild()
+    return Gamer.objects.values_list('uid', flat=True).first()
+
+
+def percentile(values, fraction):
+    """Returns the value at fraction (0-1) of the sorted values, by nearest rank"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, elapsed):
+    """Returns request count, throughput and latency percentiles (in ms) of a run"""
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p90_ms': round(percentile(latencies, 0.90) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
@@ -0,0 +1,120 @@
+"""
+Versioned response caching and ETags for the levelupapi views.
+
+Every cached response belongs to a namespace (e.g. 'gametypes'). A namespace has a version
+token kept in the cache, and both the cache keys and the ETags of its responses include that
+token. Writes bump the version (see levelupapi.signals), which invalidates every response of
+the namespace at once without having to know their keys.
+"""
+import hashlib
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import transaction
+from django.utils.cache import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def get_cache():
+    """Returns the cache backend configured by LEVELUP_CACHE_ALIAS"""
+    return caches[getattr(settings, 'LEVELUP_CACHE_ALIAS', 'default')]
+
+
+def version_key(namespace):
+    """Returns the cache key holding the version token of namespace"""
+    return f'levelup:version:{namespace}'
+
+
+def get_version(namespace):
+    """
+    Returns the current version token of namespace.
+    Tokens are random rather than counters, so a version lost to eviction is never reissued.
+    """
+    cache = get_cache()
+    key = version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(namespace):
+    """The same as get_version(), through the cache's async API"""
+    cache = get_cache()
+    key = version_key(namespace)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, uuid.uuid4().hex, timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def _bump(namespaces):
+    get_cache().set_many({version_key(namespace): uuid.uuid4().hex for namespace in namespaces}, timeout=None)
+
+
+def bump_version(*namespaces):
+    """
+    Invalidates every cached response and ETag of namespaces.
+    The bump is repeated once the transaction commits, so a reader that cached the old rows
+    while the write was still pending can't keep them under the new version.
+    """
+    _bump(namespaces)
+    transaction.on_commit(lambda: _bump(namespaces))
+
+
+def _etag(namespace, version, parts):
+    raw = ':'.join(str(part) for part in (namespace, version, *parts))
+    return '"%s"' % hashlib.md5(raw.encode()).hexdigest()
+
+
+def version_etag(namespace, *parts):
+    """Returns a strong ETag for a response of namespace identified by parts"""
+    return _etag(namespace, get_version(namespace), parts)
+
+
+async def aversion_etag(namespace, *parts):
+    """The same as version_etag(), through the cache's async API"""
+    return _etag(namespace, await aget_version(namespace), parts)
+
+
+def etag_matches(request, etag):
+    """Returns True if request is a GET or HEAD whose If-None-Match matches etag"""
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    return etag in etags or '*' in etags
+
+
+def not_modified(request, etag):
+    """Returns a 304 response if the request's If-None-Match matches etag, otherwise None"""
+    if etag_matches(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    return None
+
+
+def cached_data(namespace, key, build, timeout=DEFAULT_TIMEOUT):
+    """
+    Returns the data cached for key in the current version of namespace, building it on a miss.
+    timeout (seconds) defaults to the cache's TIMEOUT.
+    """
+    cache = get_cache()
+    cache_key = f'levelup:data:{namespace}:{get_version(namespace)}:{key}'
+    data = cache.get(cache_key)
+    if data is None:
+        data = build()
+        cache.set(cache_key, data, timeout)
+    return data
+
+
+def dashboard_namespace(gamer_id):
+    """Returns the namespace of the dashboard of a gamer, see levelupapi.views.dashboard"""
+    return f'dashboard:{gamer_id}'
+
+
+def bump_dashboards(*gamer_ids):
+    """Invalidates the dashboards of gamer_ids"""
+    bump_version(*{dashboard_namespace(gamer_id) for gamer_id in gamer_ids if gamer_id is not None})
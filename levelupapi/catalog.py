@@ -0,0 +1,203 @@
+"""Reading and writing catalog data (game types, games, events, memberships) in bulk"""
+import csv
+import json
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError
+from levelupapi.models import Event, EventGamer, Game, Gamer, GameType
+
+FORMATS = ('csv', 'ndjson')
+
+
+class CatalogError(Exception):
+    """A row that can't be imported, with the line (or the lines of the batch) it came from"""
+
+    def __init__(self, line, message, last_line=None):
+        where = f'lines {line}-{last_line}' if last_line not in (None, line) else f'line {line}'
+        super().__init__(f'{where}: {message}')
+
+
+class Spec:
+    """
+    How one model is written to and read from a catalog file: its plain `fields` and its
+    `relations`, {column: kind}, where kind names the key the related row is referred by
+    (see Importer.KEYS). Every file may also carry an `id` column, kept on import, so an
+    export can be loaded into an empty database with the references between files intact.
+    `exported` returns the rows to export when they aren't all of model.objects.
+    """
+
+    def __init__(self, model, fields, relations=None, natural_key=None, exported=None):
+        self.model = model
+        self.fields = fields
+        self.relations = relations or {}
+        self.natural_key = natural_key
+        self.exported = exported or model.objects.all
+
+    @property
+    def columns(self):
+        return ('id', *self.fields, *self.relations)
+
+
+SPECS = {
+    'game_types': Spec(GameType, ('label',), natural_key='label'),
+    'games': Spec(
+        Game, ('title', 'maker', 'number_of_players', 'skill_level'),
+        {'game_type': 'game_type', 'gamer': 'gamer'},
+    ),
+    'events': Spec(
+        Event, ('description', 'date', 'time'), {'game': 'game', 'organizer': 'gamer'},
+        exported=lambda: Event.objects.filter(game__deleted_at__isnull=True),
+    ),
+    # the memberships of soft-deleted events stay until they're purged, but their events aren't exported
+    'memberships': Spec(
+        EventGamer, (), {'event': 'event', 'gamer': 'gamer'},
+        exported=lambda: EventGamer.objects.filter(
+            event__deleted_at__isnull=True, event__game__deleted_at__isnull=True),
+    ),
+}
+"""The catalog files, in the order they must be imported"""
+
+
+def guess_format(path):
+    """Returns the format of path from its extension, defaulting to csv"""
+    return 'ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+
+def read_rows(stream, fmt):
+    """Yields (line number, row dict) from a csv (with a header) or ndjson stream"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line, text in enumerate(stream, start=1):
+        if text.strip():
+            try:
+                yield line, json.loads(text)
+            except ValueError as ex:
+                raise CatalogError(line, f'invalid JSON ({ex})') from ex
+
+
+class Importer:
+    """
+    Builds model instances from catalog rows and inserts them with bulk_create, batch_size at a time.
+    Foreign keys are resolved through maps loaded once (game type labels and gamer uids to ids,
+    the sets of existing game and event ids) instead of a lookup per row.
+    """
+
+    KEYS = {
+        'game_type': lambda: GameType.objects.values_list('label', 'id'),
+        'gamer': lambda: Gamer.objects.values_list('uid', 'id'),
+        'game': lambda: Game.objects.values_list('id', 'id'),
+        'event': lambda: Event.objects.values_list('id', 'id'),
+    }
+    """The (key, id) pairs the rows may refer to each kind of related row by, besides its id"""
+
+    def __init__(self, spec, batch_size=1000):
+        self.spec = spec
+        self.batch_size = batch_size
+        self.keys = {}
+        for kind in set(spec.relations.values()):
+            by_key = {str(key): pk for key, pk in self.KEYS[kind]().iterator()}
+            self.keys[kind] = (by_key, set(by_key.values()))
+        self.natural_keys = (
+            set(spec.model.objects.values_list(spec.natural_key, flat=True)) if spec.natural_key else None)
+        self.imported = 0
+        self.skipped = 0
+        self.explicit_ids = False
+
+    def resolve(self, kind, value):
+        """Returns the id of the kind of row value refers to: a label/uid where they exist, or an id"""
+        by_key, ids = self.keys[kind]
+        value = str(value)
+        if value in by_key:
+            return by_key[value]
+        if value.isdigit() and int(value) in ids:
+            return int(value)
+        raise ValueError(f'unknown {kind} {value!r}')
+
+    def build(self, line, row):
+        """Returns the unsaved instance for row, or None when it's already in the database"""
+        spec, values = self.spec, {}
+        try:
+            if row.get('id') not in (None, ''):
+                values['id'] = int(row['id'])
+                self.explicit_ids = True
+            for name in spec.fields:
+                field = spec.model._meta.get_field(name)
+                if row.get(name) in (None, ''):
+                    raise ValueError(f'{name} is required')
+                values[name] = field.clean(row[name], None)
+            for column, kind in spec.relations.items():
+                if row.get(column) in (None, ''):
+                    raise ValueError(f'{column} is required')
+                values[f'{column}_id'] = self.resolve(kind, row[column])
+        except (ValueError, ValidationError) as ex:
+            message = '; '.join(ex.messages) if isinstance(ex, ValidationError) else str(ex)
+            raise CatalogError(line, message) from ex
+
+        if self.natural_keys is not None:
+            key = values[spec.natural_key]
+            if key in self.natural_keys:
+                self.skipped += 1
+                return None
+            self.natural_keys.add(key)
+        return spec.model(**values)
+
+    def flush(self, batch):
+        """Inserts the (line, instance) pairs of batch, reporting a rejected INSERT with its lines"""
+        try:
+            # Duplicate memberships are dropped by the unique (event, gamer) constraint
+            self.spec.model.objects.bulk_create(
+                [instance for _, instance in batch], ignore_conflicts=self.spec.model is EventGamer)
+        except IntegrityError as ex:
+            raise CatalogError(batch[0][0], f'rejected by the database ({ex})', last_line=batch[-1][0]) from ex
+
+    def run(self, rows):
+        """Imports every (line, row) of rows; call inside a transaction"""
+        # bulk_create(ignore_conflicts=True) doesn't say which rows it dropped: count what's stored instead
+        before = self.spec.model.objects.count()
+        built, batch = 0, []
+        for line, row in rows:
+            instance = self.build(line, row)
+            if instance is not None:
+                batch.append((line, instance))
+                built += 1
+            if len(batch) == self.batch_size:
+                self.flush(batch)
+                batch = []
+        if batch:
+            self.flush(batch)
+        self.imported = self.spec.model.objects.count() - before
+        self.skipped += built - self.imported
+
+
+def export_rows(spec, chunk_size=2000):
+    """Yields the rows of the model of spec as catalog dicts, referring to related rows by label/uid where they exist"""
+    sources = {'game_type': 'game_type__label', 'gamer': '{}__uid', 'game': '{}_id', 'event': '{}_id'}
+    columns = {'id': 'id', **{name: name for name in spec.fields}}
+    for column, kind in spec.relations.items():
+        columns[column] = sources[kind].format(column)
+    queryset = spec.exported().order_by('id').values_list(*columns.values())
+    for values in queryset.iterator(chunk_size=chunk_size):
+        yield dict(zip(columns, values))
+
+
+def write_rows(stream, fmt, spec, rows):
+    """Writes rows to stream as csv (with a header) or ndjson; returns how many were written"""
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=spec.columns)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({name: _csv_value(value) for name, value in row.items()})
+            count += 1
+        return count
+    for row in rows:
+        stream.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+def _csv_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
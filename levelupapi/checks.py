@@ -0,0 +1,24 @@
+"""System checks for settings that work in development but break under several workers"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+from django.core.cache.backends.locmem import LocMemCache
+from levelupapi.cache import get_cache
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    The version tokens behind the ETags, the cached responses and the dashboards live in the
+    cache. With a per-process cache, a write in one worker doesn't invalidate what the others
+    answer, so they keep sending 304s and stale bodies until the entries time out.
+    Only run by `check --deploy`, since locmem is fine for a single development server.
+    """
+    if not isinstance(get_cache(), LocMemCache):
+        return []
+    return [Warning(
+        f'The {getattr(settings, "LEVELUP_CACHE_ALIAS", "default")!r} cache is per process (locmem): '
+        'with more than one worker, ETags and cached responses go stale after writes in another worker.',
+        hint='Set LEVELUP_CACHE_BACKEND=file or a cache server for multi-worker deployments, '
+             'or silence levelupapi.W001 when a single process serves the API.',
+        id='levelupapi.W001',
+    )]
@@ -0,0 +1,64 @@
+"""
+Optimistic concurrency for the update endpoints.
+
+Events and games carry a version that every edit increments. The update endpoints send it as the
+ETag of their response; a client that sends it back in If-Match only overwrites the row if nobody
+edited it in between, and gets 412 Precondition Failed otherwise.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils.cache import parse_etags
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The resource was changed since the version named by If-Match.'
+    default_code = 'precondition_failed'
+
+
+class Conflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The resource was changed by another request. Fetch it and try again.'
+    default_code = 'conflict'
+
+
+def row_etag(version):
+    """Returns the ETag of the version of a row"""
+    return f'"{version}"'
+
+
+def if_match_version(request):
+    """Returns the versions named by the request's If-Match, or None when it has none (or is *)"""
+    etags = parse_etags(request.META.get('HTTP_IF_MATCH', ''))
+    if not etags or '*' in etags:
+        return None
+    versions = [int(etag.strip('"')) for etag in etags if etag.strip('"').isdigit()]
+    if not versions:
+        raise PreconditionFailed()
+    return versions
+
+
+def update_row(model, pk, changes, request, read=()):
+    """
+    Writes changes ({column: value}) to the row pk of model with a single UPDATE, in a transaction,
+    and increments its version. Returns the row as it was before, with its version and the
+    columns in read, so callers can adjust whatever depends on the old values.
+
+    The UPDATE is conditional on the version read first: if another edit lands in between,
+    nothing is written and Conflict is raised, whether or not the client sent If-Match.
+    Callers that write more rows wrap the call and their writes in one transaction.atomic().
+    """
+    with transaction.atomic():
+        row = model.objects.select_for_update().filter(pk=pk).values('version', *read).first()
+        if row is None:
+            raise NotFound(f'No {model._meta.verbose_name} matches the given query.')
+        expected = if_match_version(request)
+        if expected is not None and row['version'] not in expected:
+            raise PreconditionFailed()
+        updated = model.objects.filter(pk=pk, version=row['version']).update(
+            **changes, version=F('version') + 1)
+        if not updated:
+            raise Conflict()
+    return row
@@ -0,0 +1,132 @@
+"""
+Deleting events and games without loading what cascades from them.
+
+Model.delete() has Django's collector fetch every event of a game and every membership of those
+events, and send a post_delete signal for each, before deleting them one batch at a time. Here the
+memberships, waitlist entries, events and games go with one DELETE per table, filtered by
+subqueries, in a single transaction; the few ids the bookkeeping needs (the events' games and
+organizers) are read first, and the caches, counters, search index and roster streams are updated
+the way the signals would have.
+
+Deletes that would remove at least LEVELUP_SOFT_DELETE_THRESHOLD rows only mark the rows deleted
+(deleted_at) and hide them behind the default managers, which costs one UPDATE per table however
+many memberships there are. The purge_deleted command removes them later, outside the request.
+"""
+from collections import Counter
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from levelupapi import roster, search
+from levelupapi.cache import bump_dashboards, bump_version
+from levelupapi.models import Event, EventGamer, Game, WaitlistEntry
+from levelupapi.signals import add_to_counter
+
+
+def soft_delete(rows):
+    """Whether a delete removing rows rows (events and memberships) should only mark them deleted"""
+    threshold = getattr(settings, 'LEVELUP_SOFT_DELETE_THRESHOLD', None)
+    return threshold is not None and rows >= threshold
+
+
+def raw_delete(queryset):
+    """
+    Deletes the rows of queryset with a single DELETE, without the collector: no cascades and no
+    pre/post_delete signals. Callers delete what would cascade first (memberships and waitlist
+    entries before their events, events before their games) and adjust the counters, versions and
+    the rest of what the signals keep in step themselves. The one use of QuerySet._raw_delete(),
+    a private Django API, so an upgrade that changes it breaks only here. Returns the rows deleted.
+    """
+    return queryset._raw_delete(queryset.db)  # pylint: disable=protected-access
+
+
+def remove_events(events):
+    """Deletes the events of the queryset events with their memberships and waitlists, a DELETE per table"""
+    ids = events.values('id')
+    raw_delete(EventGamer.objects.filter(event__in=ids))
+    raw_delete(WaitlistEntry.objects.filter(event__in=ids))
+    raw_delete(events)
+
+
+def remove_games(games):
+    """Deletes the games of the queryset games with their events (see remove_events)"""
+    remove_events(Event.all_objects.filter(game__in=games.values('id')))
+    raw_delete(games)
+
+
+def forget(events=(), games=()):
+    """
+    Does what the delete signals would have for the (id, owner or organizer) of the deleted events
+    and games: invalidates the lists and dashboards, unindexes them and tells the roster streams.
+    Dashboards of the attendees may show the events until LEVELUP_DASHBOARD_TTL runs out.
+    """
+    bump_version('events', 'games')
+    bump_dashboards(*{gamer_id for _, gamer_id in (*events, *games)})
+    backend = search.get_backend()
+    backend.remove(search.DOCUMENTS['events'], [pk for pk, _ in events])
+    backend.remove(search.DOCUMENTS['games'], [pk for pk, _ in games])
+    roster.publish(*({'type': 'delete', 'event': pk} for pk, _ in events))
+
+
+def delete_events(event_ids, soft=None):
+    """
+    Deletes the events event_ids, and their memberships and waitlists, in one transaction, or
+    only marks them deleted when soft is true (by default, when they have at least
+    LEVELUP_SOFT_DELETE_THRESHOLD attendees between them). Returns the number of events deleted.
+    """
+    with transaction.atomic():
+        events = Event.objects.filter(pk__in=event_ids)
+        rows = list(events.values_list('id', 'game_id', 'organizer_id', 'attendees_count'))
+        if not rows:
+            return 0
+        events = Event.all_objects.filter(pk__in=[pk for pk, *_ in rows])
+        if soft is None:
+            soft = soft_delete(len(rows) + sum(attendees for *_, attendees in rows))
+        if soft:
+            events.update(deleted_at=timezone.now())
+        else:
+            remove_events(events)
+        for game_id, count in Counter(game_id for _, game_id, _, _ in rows).items():
+            add_to_counter(Game.objects.filter(pk=game_id), 'event_count', -count)
+        forget(events=[(pk, organizer_id) for pk, _, organizer_id, _ in rows])
+    return len(rows)
+
+
+def delete_games(game_ids, soft=None):
+    """
+    Deletes the games game_ids with their events (see delete_events) in one transaction, or only
+    marks them and their events deleted when soft is true (by default, when the games have at
+    least LEVELUP_SOFT_DELETE_THRESHOLD events and attendees between them). Returns the number of
+    games deleted.
+    """
+    with transaction.atomic():
+        games = list(Game.objects.filter(pk__in=game_ids).values_list('id', 'gamer_id'))
+        if not games:
+            return 0
+        ids = [pk for pk, _ in games]
+        live_events = Event.objects.filter(game__in=ids)
+        events = list(live_events.values_list('id', 'organizer_id', 'attendees_count'))
+        if soft is None:
+            soft = soft_delete(len(events) + sum(attendees for *_, attendees in events))
+        if soft:
+            now = timezone.now()
+            live_events.update(deleted_at=now)
+            Game.all_objects.filter(pk__in=ids).update(deleted_at=now)
+        else:
+            remove_games(Game.all_objects.filter(pk__in=ids))
+        forget(events=[(pk, organizer_id) for pk, organizer_id, _ in events], games=games)
+    return len(games)
+
+
+def purge(before, batch_size=500):
+    """
+    Deletes the games and events soft-deleted before the datetime before, batch_size games (or
+    events) per transaction so the tables aren't locked for long. Returns (games, events) deleted.
+    """
+    purged = [0, 0]
+    for index, (model, remove) in enumerate(((Game, remove_games), (Event, remove_events))):
+        deleted = model.all_objects.filter(deleted_at__lt=before).order_by('id')
+        while ids := list(deleted.values_list('id', flat=True)[:batch_size]):
+            with transaction.atomic():
+                remove(model.all_objects.filter(pk__in=ids))
+            purged[index] += len(ids)
+    return tuple(purged)
@@ -0,0 +1,132 @@
+"""Flat serializers that render the list endpoints from QuerySet.values() rows"""
+import functools
+from operator import itemgetter
+from rest_framework.exceptions import ValidationError
+
+
+@functools.lru_cache(maxsize=4096)
+def format_temporal(value, output_format):
+    """
+    Formats a date or time like DRF's DateField/TimeField do. Events cluster on a small number
+    of dates and times, so the formatted strings are cached instead of rebuilt for every row.
+    """
+    return value.strftime(output_format)
+
+
+class Field:
+    """
+    A column of the values() row, optionally formatted by `output_format` (a strftime format).
+    `method` renders the field with the serializer's get_<name>(row) instead, fetching `columns`.
+    """
+
+    def __init__(self, output_format=None, method=False, columns=()):
+        self.output_format = output_format
+        self.method = method
+        self.columns = columns
+
+
+class Relation:
+    """
+    A foreign key, rendered as the related object when expanded and as its id otherwise.
+    `fields` are the fields of the related object after its id, in output order.
+    """
+
+    def __init__(self, **fields):
+        self.fields = fields
+
+
+class FlatSerializer:
+    """
+    A read-only serializer for the hot list endpoints. The depth=2 ModelSerializers build a tree
+    of nested serializer and field objects and walk it for every instance; a flat serializer
+    fetches plain dicts with `values()` and builds each item from a list of getters.
+
+    Subclasses declare their output in `fields`, in the order the ModelSerializer they stand in
+    for renders it. Clients can ask for less with `fields` (the top-level names to include) and
+    `expand` (the relations to embed, dotted for nested ones like 'game.gamer'; the others are
+    rendered as ids). Only the columns, joins and annotations behind the selected fields end up in
+    the SQL, since values() leaves out every annotation it isn't asked for.
+    Without either, every field is included and every relation embedded.
+    """
+
+    fields = {}
+
+    def __init__(self, fields=None, expand=None, context=None):
+        self.context = context or {}
+        names = list(self.fields) if fields is None else fields
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ValidationError({'fields': [f'Unknown field: {name}' for name in unknown]})
+
+        expanded = None if expand is None else self.expanded_paths(expand)
+        self.columns = []
+        self.getters = [
+            (name, self.getter(name, self.fields[name], name, expanded)) for name in names
+        ]
+
+    @classmethod
+    def from_query_params(cls, query_params, context=None):
+        """Builds the serializer selected by the ?fields= and ?expand= query parameters"""
+
+        def names(param):
+            value = query_params.get(param)
+            return None if value is None else [name for name in value.split(',') if name]
+
+        return cls(fields=names('fields'), expand=names('expand'), context=context)
+
+    def expanded_paths(self, expand):
+        """Returns the relation paths to embed, checking them and adding their parents"""
+        paths = set()
+        for path in expand:
+            spec, parts = self, path.split('.')
+            for depth, part in enumerate(parts):
+                spec = spec.fields.get(part)
+                if not isinstance(spec, Relation):
+                    raise ValidationError({'expand': [f'Unknown relation: {path}']})
+                paths.add('__'.join(parts[:depth + 1]))
+        return paths
+
+    def getter(self, name, spec, path, expanded):
+        """Returns the function that renders spec at path from a row, recording the columns it needs"""
+        if isinstance(spec, Relation):
+            if expanded is not None and path not in expanded:
+                self.columns.append(f'{path}_id')
+                return itemgetter(f'{path}_id')
+            getters = [('id', self.getter('id', Field(), f'{path}_id', expanded))]
+            getters += [
+                (field, self.getter(field, sub_spec, f'{path}__{field}', expanded))
+                for field, sub_spec in spec.fields.items()
+            ]
+            return lambda row: {field: get(row) for field, get in getters}
+
+        if spec.method:
+            self.columns.extend(spec.columns)
+            return getattr(self, f'get_{name}')
+        self.columns.append(path)
+        if spec.output_format is not None:
+            return lambda row: format_temporal(row[path], spec.output_format)
+        return itemgetter(path)
+
+    def selects(self, name):
+        """Returns True if the top-level field name is rendered"""
+        return any(field == name for field, _ in self.getters)
+
+    def values(self, queryset, *columns):
+        """
+        Returns queryset fetching only the columns the selected fields need, plus columns
+        (e.g. the ordering fields read by the paginator), as dicts
+        """
+        return queryset.values(*dict.fromkeys([*self.columns, *columns]))
+
+    def load(self, rows):
+        """Fetches whatever the rows need besides their own columns, before they're serialized"""
+
+    async def aload(self, rows):
+        """The same as load(), with the async ORM"""
+
+    def to_representation(self, row):
+        return {name: get(row) for name, get in self.getters}
+
+    def serialize(self, rows):
+        """Renders every row"""
+        return [self.to_representation(row) for row in rows]
@@ -0,0 +1,83 @@
+"""Compares the async (ASGI) read endpoints with the DRF (WSGI) ones under concurrent load"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from levelupapi.benchmark import benchmark_database, seed, summarize
+from levelupapi.models import Event, Game
+
+DEFAULT_PATHS = ['/events', '/events?page_size=50', '/events/{event}', '/games', '/games/{game}']
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a throwaway database and replays concurrent GETs against the hot read endpoints, '
+        'once through the DRF views (the WSGI path) and once through the async views (the ASGI '
+        'path), reporting requests/second and latency percentiles for each.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=1000, help='Events to seed.')
+        parser.add_argument('--games', type=int, default=200, help='Games to seed.')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per path and server.')
+        parser.add_argument('--concurrency', type=int, default=16, help='Requests in flight at once.')
+        parser.add_argument('--path', action='append', dest='paths', help=(
+            'Path to request, may be repeated. {event} and {game} are replaced with existing ids. '
+            f'Defaults to {", ".join(DEFAULT_PATHS)}.'))
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            uid = seed(games=options['games'], events=options['events'])
+            ids = {
+                'event': Event.objects.values_list('id', flat=True).first(),
+                'game': Game.objects.values_list('id', flat=True).first(),
+            }
+            connection.close()
+
+            self.stdout.write(f'{"path":<28}{"server":<8}{"rps":>9}{"p50 ms":>10}{"p99 ms":>10}')
+            for path in options['paths'] or DEFAULT_PATHS:
+                path = path.format(**ids)
+                for server, run in (('wsgi', self.run_wsgi), ('asgi', self.run_asgi)):
+                    result = run(path, uid, options['requests'], options['concurrency'])
+                    self.stdout.write(
+                        f'{path:<28}{server:<8}{result["rps"]:>9}{result["p50_ms"]:>10}{result["p99_ms"]:>10}')
+
+    def run_wsgi(self, path, uid, requests, concurrency):
+        """Replays path through the DRF views from a pool of threads"""
+
+        def get(_):
+            started = time.perf_counter()
+            response = Client(HTTP_AUTHORIZATION=uid).get(path)
+            assert response.status_code == 200, response.status_code
+            return time.perf_counter() - started
+
+        with override_settings(ROOT_URLCONF='levelup.urls'):
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                started = time.perf_counter()
+                latencies = list(pool.map(get, range(requests)))
+                elapsed = time.perf_counter() - started
+        return summarize(latencies, elapsed)
+
+    def run_asgi(self, path, uid, requests, concurrency):
+        """Replays path through the async views from one event loop"""
+
+        async def run():
+            client = AsyncClient()
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def get():
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.get(path, headers={'Authorization': uid})
+                    assert response.status_code == 200, response.status_code
+                    return time.perf_counter() - started
+
+            started = time.perf_counter()
+            latencies = await asyncio.gather(*(get() for _ in range(requests)))
+            return latencies, time.perf_counter() - started
+
+        with override_settings(ROOT_URLCONF='levelup.asgi_urls'):
+            latencies, elapsed = asyncio.run(run())
+        return summarize(latencies, elapsed)
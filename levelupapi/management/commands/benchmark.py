@@ -0,0 +1,196 @@
+"""Benchmarks every API endpoint against a seeded throwaway database"""
+import datetime
+import json
+import platform
+import statistics
+import time
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from levelupapi.benchmark import benchmark_database, seed, summarize
+from levelupapi.models import Event, EventGamer, Game, Gamer, GameType
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a throwaway database with configurable volumes, sends every router endpoint plus '
+        '/register and /checkuser a number of requests, and reports latency percentiles, query '
+        'counts and response sizes. Results can be written as JSON and compared with a previous '
+        'run, failing when an endpoint got slower than the threshold or runs more queries.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--gamers', type=int, default=100)
+        parser.add_argument('--game-types', type=int, default=10)
+        parser.add_argument('--games', type=int, default=500)
+        parser.add_argument('--events', type=int, default=2000)
+        parser.add_argument('--attendees', type=int, default=5, help='Gamers joined to each event.')
+        parser.add_argument('--requests', type=int, default=20, help='Requests per endpoint.')
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help='Only run endpoints whose name contains this text. May be repeated.')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+        parser.add_argument('--baseline', help='Compare with the JSON results of a previous run.')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Allowed p50/p90 slowdown against the baseline, as a fraction (default 0.25).')
+        parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                            help='Ignore slowdowns smaller than this, which are mostly noise (default 1.0).')
+
+    def handle(self, *args, **options):
+        volumes = {
+            'gamers': options['gamers'],
+            'game_types': options['game_types'],
+            'games': options['games'],
+            'events': options['events'],
+            'attendees': options['attendees'],
+        }
+        with benchmark_database():
+            uid = seed(**volumes)
+            self.gamer = Gamer.objects.get(uid=uid)
+            self.client = APIClient(HTTP_AUTHORIZATION=uid)
+            # Warm the gamer cache so the first measured request isn't charged for it
+            self.client.get('/gametypes')
+            results = {}
+            self.stdout.write(
+                f'{"endpoint":<32}{"p50 ms":>9}{"p90 ms":>9}{"p99 ms":>9}{"queries":>9}{"bytes":>10}')
+            for name, prepare in self.endpoints():
+                if options['endpoints'] and not any(text in name for text in options['endpoints']):
+                    continue
+                results[name] = self.measure(prepare, options['requests'])
+                result = results[name]
+                self.stdout.write(
+                    f'{name:<32}{result["p50_ms"]:>9}{result["p90_ms"]:>9}{result["p99_ms"]:>9}'
+                    f'{result["queries"]:>9}{result["bytes"]:>10}')
+
+        report = {
+            'meta': {
+                'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'volumes': volumes,
+                'requests': options['requests'],
+            },
+            'endpoints': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, indent=2)
+        if options['baseline']:
+            self.compare(report, options['baseline'], options['threshold'], options['min_delta_ms'])
+
+    def measure(self, prepare, requests):
+        """Sends the requests built by prepare(i) and summarizes them"""
+        latencies, queries, sizes, statuses = [], [], [], set()
+        for i in range(requests):
+            method, path, data, *headers = prepare(i)
+            headers = headers[0] if headers else {}
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = getattr(self.client, method)(path, data, format='json', **headers)
+                # a streamed body is only produced (and its queries run) as it's read
+                body = b''.join(response.streaming_content) if response.streaming else response.content
+                latencies.append(time.perf_counter() - started)
+            queries.append(len(captured))
+            sizes.append(len(body))
+            statuses.add(response.status_code)
+        result = summarize(latencies, sum(latencies))
+        result.update({
+            'queries': max(queries),
+            'bytes': round(statistics.fmean(sizes)),
+            'statuses': sorted(statuses),
+        })
+        return result
+
+    def compare(self, report, baseline_path, threshold, min_delta_ms):
+        """Raises CommandError if an endpoint regressed against the results in baseline_path"""
+        with open(baseline_path, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)['endpoints']
+
+        regressions = []
+        for name, result in report['endpoints'].items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            for metric in ('p50_ms', 'p90_ms'):
+                limit = max(before[metric] * (1 + threshold), before[metric] + min_delta_ms)
+                if result[metric] > limit:
+                    regressions.append(f'{name}: {metric} {before[metric]} -> {result[metric]}')
+            if result['queries'] > before['queries']:
+                regressions.append(f'{name}: queries {before["queries"]} -> {result["queries"]}')
+
+        if regressions:
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(regression))
+            raise CommandError(f'{len(regressions)} regressions against {baseline_path}.')
+        self.stdout.write(self.style.SUCCESS(f'No regressions against {baseline_path}.'))
+
+    def endpoints(self):
+        """
+        Returns (name, prepare) for every endpoint. prepare(i) builds the i-th request as
+        (client method, path, data[, headers]), creating whatever it needs beforehand (not timed).
+        """
+        gamer = self.gamer
+        game_type = GameType.objects.first()
+        event_ids = list(Event.objects.order_by('id').values_list('id', flat=True))
+        game_ids = list(Game.objects.order_by('id').values_list('id', flat=True))
+
+        def new_game():
+            return Game.objects.create(
+                game_type=game_type, gamer=gamer, title='Benchmark', maker='Benchmark',
+                number_of_players=4, skill_level=1)
+
+        def new_event():
+            return Event.objects.create(
+                game_id=game_ids[0], organizer=gamer, description='Benchmark',
+                date=datetime.date(2024, 1, 1), time=datetime.time(18, 0))
+
+        def joined_event():
+            event = new_event()
+            EventGamer.objects.create(gamer=gamer, event=event)
+            return event
+
+        def etag(path):
+            return {'HTTP_IF_NONE_MATCH': self.client.get(path)['ETag']}
+
+        event_body = {
+            'game': game_ids[0], 'description': 'Benchmark', 'date': '2024-01-01',
+            'time': '18:00', 'organizer': gamer.id, 'userId': gamer.uid,
+        }
+        game_body = {
+            'title': 'Benchmark', 'maker': 'Benchmark', 'number_of_players': 4, 'skill_level': 1,
+            'game_type': game_type.id, 'numberOfPlayers': 4, 'skillLevel': 1, 'gameType': game_type.id,
+        }
+        return [
+            ('GET /gametypes', lambda i: ('get', '/gametypes', None)),
+            ('GET /gametypes/<id>', lambda i: ('get', f'/gametypes/{game_type.id}', None)),
+            ('GET /events', lambda i: ('get', '/events', None)),
+            ('GET /events (304)', lambda i: ('get', '/events', None, etag('/events'))),
+            ('GET /events?page_size=50', lambda i: ('get', '/events?page_size=50', None)),
+            ('GET /events?fields=<mobile>', lambda i: ('get', '/events?fields=id,description,date,joined', None)),
+            ('GET /events?export=ndjson', lambda i: ('get', '/events?export=ndjson', None)),
+            ('GET /events/<id>', lambda i: ('get', f'/events/{event_ids[i % len(event_ids)]}', None)),
+            ('POST /events', lambda i: ('post', '/events', event_body)),
+            ('PUT /events/<id>', lambda i: ('put', f'/events/{new_event().id}', event_body)),
+            ('DELETE /events/<id>', lambda i: ('delete', f'/events/{joined_event().id}', None)),
+            ('POST /events/<id>/signup', lambda i: ('post', f'/events/{new_event().id}/signup', None)),
+            ('DELETE /events/<id>/leave', lambda i: ('delete', f'/events/{joined_event().id}/leave', None)),
+            ('POST /events/signup', lambda i: (
+                'post', '/events/signup', {'events': [new_event().id for _ in range(20)]})),
+            ('DELETE /events/leave', lambda i: ('delete', '/events/leave', {'events': [joined_event().id for _ in range(20)]})),
+            ('GET /games', lambda i: ('get', '/games', None)),
+            ('GET /games (304)', lambda i: ('get', '/games', None, etag('/games'))),
+            ('GET /games?page_size=50', lambda i: ('get', '/games?page_size=50', None)),
+            ('GET /games?export=json', lambda i: ('get', '/games?export=json', None)),
+            ('GET /games?expand=', lambda i: ('get', '/games?expand=', None)),
+            ('GET /games?type=<id>', lambda i: ('get', f'/games?type={game_type.id}', None)),
+            ('GET /games/<id>', lambda i: ('get', f'/games/{game_ids[i % len(game_ids)]}', None)),
+            ('GET /dashboard', lambda i: ('get', '/dashboard', None)),
+            ('GET /search?q=<prefix>', lambda i: ('get', '/search?q=ga', None)),
+            ('POST /games', lambda i: ('post', '/games', game_body)),
+            ('PUT /games/<id>', lambda i: ('put', f'/games/{new_game().id}', game_body)),
+            ('DELETE /games/<id>', lambda i: ('delete', f'/games/{new_game().id}', None)),
+            ('POST /register', lambda i: ('post', '/register', {'uid': f'register-{i}', 'bio': 'Benchmark'})),
+            ('POST /checkuser', lambda i: ('post', '/checkuser', {'uid': gamer.uid})),
+        ]
@@ -0,0 +1,136 @@
+"""Runs EXPLAIN on the querysets behind the API views and fails on full table scans"""
+import datetime
+import re
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from levelupapi.models import Event, EventGamer, Game, Gamer, WaitlistEntry
+from levelupapi.pagination import KeysetPagination
+from levelupapi.views.event import FlatEventSerializer
+from levelupapi.views.game import FlatGameSerializer
+
+BIG_TABLES = {
+    Event._meta.db_table,
+    EventGamer._meta.db_table,
+    Game._meta.db_table,
+    Gamer._meta.db_table,
+    WaitlistEntry._meta.db_table,
+}
+"""Tables that grow with usage; the small lookup tables (game types) may be scanned"""
+
+PAGE_SIZE = KeysetPagination.default_page_size
+
+SORT = 'ORDER BY'
+"""Allows a paged query to sort its matches, for filters whose index narrows them to a small set"""
+
+
+def audited_queries():
+    """
+    Returns (name, queryset, allowed) for every query the views run per request, where allowed
+    is the set of tables the query may walk in full because it's read in primary key order and
+    stopped by a LIMIT (plus SORT when it may sort what an index found). Unpaginated list
+    queries return every row by design and aren't audited.
+    """
+    gamer = Gamer(pk=1)
+    events = FlatEventSerializer().values(Event.objects.with_attendance(gamer)).order_by('date', 'time', 'id')
+    games = FlatGameSerializer().values(Game.objects.with_event_counts(gamer)).order_by('id')
+    seek = KeysetPagination(ordering=('date', 'time', 'id')).seek(
+        [datetime.date(2023, 1, 1), datetime.time(12, 0), 1])
+    filtered = FlatEventSerializer().values(Event.objects.with_attendance(gamer))
+    today = datetime.date(2023, 1, 1)
+    # The games of one type and the memberships of one gamer are found through their indexes,
+    # and only those events are sorted
+    event_filters = [
+        ('date range', filtered.filter(date__gte=today, date__lte=today + datetime.timedelta(days=30)), set()),
+        ('game', filtered.filter(game_id=1), set()),
+        ('game_type', filtered.filter(game__game_type_id=1), {SORT}),
+        ('organizer', filtered.filter(organizer_id=1), set()),
+        ('joined', filtered.joined_by(gamer), {SORT}),
+        ('not joined', filtered.joined_by(gamer, joined=False), set()),
+        ('upcoming', filtered.upcoming(today), set()),
+        ('game and organizer', filtered.filter(game_id=1, organizer_id=1), set()),
+        ('upcoming joined', filtered.upcoming(today).joined_by(gamer), {SORT}),
+    ]
+    return [
+        *[
+            (f'events.list ?{name} ordering={direction}date', queryset.order_by(*(
+                f'{direction}{field}' for field in ('date', 'time', 'id')))[:PAGE_SIZE + 1], allowed)
+            for name, queryset, allowed in event_filters
+            for direction in ('', '-')
+        ],
+        ('gamer by uid', Gamer.objects.filter(uid='uid'), set()),
+        ('events.list first page', events[:PAGE_SIZE + 1], set()),
+        ('events.list next page', events.filter(seek)[:PAGE_SIZE + 1], set()),
+        ('events.retrieve', Event.objects.with_related().filter(pk=1), set()),
+        ('events.signup', EventGamer.objects.filter(gamer=gamer, event_id=1), set()),
+        ('events.bulk_signup', EventGamer.objects.filter(gamer=gamer, event_id__in=[1, 2, 3]), set()),
+        ('events.signup waitlist lengths', WaitlistEntry.objects.filter(event_id__in=[1, 2, 3]).values('event_id')
+         .annotate(entries=Count('id')), set()),
+        ('events.signup waitlist position', WaitlistEntry.objects.filter(event_id=1, id__lte=10), set()),
+        ('events.leave waitlist head', WaitlistEntry.objects.filter(event_id=1).order_by('id')[:2], set()),
+        ('games.list first page', games[:PAGE_SIZE + 1], {Game._meta.db_table}),
+        ('games.list next page', games.filter(id__gt=1)[:PAGE_SIZE + 1], set()),
+        ('games.list ?type=', games.filter(game_type_id=1)[:PAGE_SIZE + 1], set()),
+        ('games.list event_info', FlatGameSerializer.event_info_rows([{'id': 1}, {'id': 2}]), set()),
+        ('games.retrieve', Game.objects.with_related().filter(pk=1), set()),
+        ('dashboard joined events', Event.objects.joined_by(gamer).order_by('date', 'time', 'id'), set()),
+        ('dashboard organized events', Event.objects.filter(organizer=gamer).order_by('date', 'time', 'id'), set()),
+        ('dashboard games', gamer.games.order_by('id'), set()),
+    ]
+
+
+def find_problems(vendor, plan, allowed, limited):
+    """Returns a description of every full scan (or full sort of a paged query) in plan"""
+    problems = []
+    for line in plan.splitlines():
+        if vendor == 'sqlite':
+            match = re.search(r'\bSCAN (\w+)', line)
+            if match and 'USING' not in line and match.group(1) in BIG_TABLES - allowed:
+                problems.append(f'full scan of {match.group(1)}')
+            if limited and SORT not in allowed and 'USE TEMP B-TREE FOR ORDER BY' in line:
+                problems.append('sorts every row before applying the LIMIT')
+        elif vendor == 'postgresql':
+            match = re.search(r'Seq Scan on (\w+)', line)
+            if match and match.group(1) in BIG_TABLES - allowed:
+                problems.append(f'full scan of {match.group(1)}')
+    return problems
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs EXPLAIN on the querysets behind the event, game and auth views and exits with an '
+        'error if any of them would scan one of the big tables in full.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Print the full plan of every query, not just the failing ones.',
+        )
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f'Query plans of the {vendor} backend are not supported.')
+
+        failures = 0
+        with transaction.atomic():
+            if vendor == 'postgresql':
+                # On small tables the planner prefers a sequential scan even when an index fits,
+                # so ask it to avoid them: a Seq Scan that remains means no index applies
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for name, queryset, allowed in audited_queries():
+                plan = queryset.explain()
+                problems = find_problems(vendor, plan, allowed, queryset.query.high_mark is not None)
+                if problems:
+                    failures += 1
+                    self.stdout.write(self.style.ERROR(f'FAIL {name}: {", ".join(problems)}'))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'ok   {name}'))
+                if problems or options['verbose_plans']:
+                    self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f'{failures} queries scan a big table in full.')
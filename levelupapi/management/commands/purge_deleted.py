@@ -0,0 +1,30 @@
+"""Removes the soft-deleted games and events"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from levelupapi.deletion import purge
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes the games and events soft-deleted by DELETE requests over '
+        'LEVELUP_SOFT_DELETE_THRESHOLD, with their memberships, a batch per transaction. '
+        'Run it periodically (e.g. from cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=0, metavar='SECONDS',
+            help='Only purge rows deleted at least this long ago (default: all of them).',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Games (or events) deleted per transaction (default: 500).',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        games, events = purge(
+            timezone.now() - timedelta(seconds=options['older_than']), options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Purged {games} games and {events} events.'))
@@ -0,0 +1,25 @@
+"""Rebuilds the search index from the tables"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from levelupapi.search import DOCUMENTS, get_backend
+
+
+class Command(BaseCommand):
+    help = (
+        'Reindexes every game and event (or only the kinds given) for /search, e.g. after raw SQL '
+        'or restoring a backup. The index is otherwise kept up to date as rows are written.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kinds', nargs='*', help=f'Any of {", ".join(DOCUMENTS)} (default: all).')
+
+    def handle(self, *args, **options):
+        unknown = set(options['kinds']) - set(DOCUMENTS)
+        if unknown:
+            raise CommandError(f'Unknown kinds: {", ".join(sorted(unknown))}.')
+        documents = [DOCUMENTS[kind] for kind in options['kinds'] or DOCUMENTS]
+        backend = get_backend()
+        with transaction.atomic():
+            backend.rebuild(documents)
+        counts = ', '.join(f'{document.model.objects.count()} {document.kind}' for document in documents)
+        self.stdout.write(self.style.SUCCESS(f'Reindexed {counts} with {type(backend).__name__}.'))
@@ -0,0 +1,34 @@
+"""Recomputes the stored attendee and event counters"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from levelupapi.cache import bump_version
+from levelupapi.models import Event, Game
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes Event.attendees_count and Game.event_count from the memberships and events '
+        'they count, fixing the rows that drifted (e.g. after raw SQL or an interrupted import).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report how many counters are wrong.',
+        )
+
+    def handle(self, *args, **options):
+        events = Event.objects.stale_attendee_counts()
+        games = Game.objects.stale_event_counts()
+        if options['dry_run']:
+            self.stdout.write(
+                f'{events.count()} event attendee counts and {games.count()} game event counts are wrong.')
+            return
+
+        with transaction.atomic():
+            fixed_events = events.recount_attendees()
+            fixed_games = games.recount_events()
+        if fixed_events or fixed_games:
+            bump_version('events', 'games')
+        self.stdout.write(self.style.SUCCESS(
+            f'Fixed {fixed_events} event attendee counts and {fixed_games} game event counts.'))
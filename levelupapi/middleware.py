@@ -0,0 +1,191 @@
+"""Per-request query and timing instrumentation"""
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('levelupapi.metrics')
+
+
+class QueryRecorder:
+    """
+    A database execute wrapper that counts queries, sums their time and tallies each distinct
+    SQL statement. The SQL is recorded with placeholders rather than values, so the same lookup
+    repeated for every row of a list (an N+1) shows up as one statement with a high count.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+    def duplicates(self, threshold):
+        """Returns {sql: count} for the statements that ran at least threshold times"""
+        return {sql: count for sql, count in self.statements.items() if count >= threshold}
+
+
+class MetricsRegistry:
+    """Totals of the sampled requests per view, rendered in the Prometheus text format"""
+
+    FIELDS = (
+        ('requests_total', 'counter', 'Sampled requests.'),
+        ('db_queries_total', 'counter', 'Database queries run by sampled requests.'),
+        ('db_seconds_total', 'counter', 'Time spent in the database by sampled requests.'),
+        ('render_seconds_total', 'counter', 'Time spent rendering (serializing) sampled responses.'),
+        ('seconds_total', 'counter', 'Total time of sampled requests.'),
+        ('response_bytes_total', 'counter', 'Body size of sampled responses.'),
+        ('duplicate_queries_total', 'counter', 'Sampled requests that repeated a statement (likely N+1).'),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = defaultdict(lambda: dict.fromkeys((name for name, _, _ in self.FIELDS), 0))
+
+    def record(self, view, **values):
+        """Adds one request of view to the totals"""
+        with self._lock:
+            totals = self._views[view]
+            totals['requests_total'] += 1
+            for name, value in values.items():
+                totals[name] += value
+
+    def clear(self):
+        """Forgets every total"""
+        with self._lock:
+            self._views.clear()
+
+    def render(self):
+        """Returns the totals in the Prometheus text exposition format"""
+        with self._lock:
+            views = {view: dict(totals) for view, totals in self._views.items()}
+        lines = []
+        for name, kind, description in self.FIELDS:
+            metric = f'levelup_{name}'
+            lines.append(f'# HELP {metric} {description}')
+            lines.append(f'# TYPE {metric} {kind}')
+            for view, totals in sorted(views.items()):
+                label = re.sub(r'(["\\])', r'\\\1', view)
+                lines.append(f'{metric}{{view="{label}"}} {totals[name]:g}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+
+class QueryTimingMiddleware:
+    """
+    Measures a sample of requests: the view that served it, number of queries, time spent in
+    the database and rendering the response, total time and response size. The numbers go into
+    a Server-Timing header (visible in the browser's network panel) and the totals served at
+    /metrics. Statements repeated LEVELUP_METRICS_DUPLICATE_THRESHOLD times in one request
+    are logged as a likely N+1.
+
+    LEVELUP_METRICS_SAMPLE_RATE (0 to 1) sets the share of requests measured; the others pass
+    straight through, so a low rate costs one random() call per request.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'LEVELUP_METRICS_SAMPLE_RATE', 1.0)
+        self.duplicate_threshold = getattr(settings, 'LEVELUP_METRICS_DUPLICATE_THRESHOLD', 3)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled(request):
+            return self.get_response(request)
+        recorder, started = QueryRecorder(), time.perf_counter()
+        with self.recording(recorder):
+            response = self.get_response(request)
+        return self.finish(request, response, recorder, started)
+
+    async def __acall__(self, request):
+        if not self.sampled(request):
+            return await self.get_response(request)
+        recorder, started = QueryRecorder(), time.perf_counter()
+        # connections are per thread, and the async ORM runs its queries on the thread-sensitive
+        # executor thread rather than the event loop's: install the recorder there
+        stack = await sync_to_async(self.recording)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.finish(request, response, recorder, started)
+
+    def sampled(self, request):
+        """Decides whether request is measured and marks it accordingly"""
+        request.levelup_sampled = self.sample_rate >= 1 or random.random() < self.sample_rate
+        return request.levelup_sampled
+
+    def recording(self, recorder):
+        """Installs recorder on every database connection"""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        return stack
+
+    def process_template_response(self, request, response):
+        """Times the rendering of DRF and template responses, which happens after the view returns"""
+        if not getattr(request, 'levelup_sampled', False):
+            return response
+        started = time.perf_counter()
+
+        def rendered(response):
+            request.levelup_render_seconds = time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, recorder, started):
+        """Records the measurements of request and adds the Server-Timing header to response"""
+        total = time.perf_counter() - started
+        render = getattr(request, 'levelup_render_seconds', 0.0)
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or match._func_path) if match else 'unresolved'
+        size = 0 if response.streaming else len(response.content)
+        duplicates = recorder.duplicates(self.duplicate_threshold)
+
+        if duplicates:
+            sql, count = max(duplicates.items(), key=lambda item: item[1])
+            logger.warning('%s ran the same query %d times (likely N+1): %s', view, count, sql)
+
+        metrics.record(
+            view,
+            db_queries_total=recorder.count,
+            db_seconds_total=recorder.duration,
+            render_seconds_total=render,
+            seconds_total=total,
+            response_bytes_total=size,
+            duplicate_queries_total=1 if duplicates else 0,
+        )
+
+        timings = [
+            f'db;dur={recorder.duration * 1000:.2f};desc="{recorder.count} queries"',
+            f'render;dur={render * 1000:.2f}',
+            f'app;dur={max(total - recorder.duration - render, 0) * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ]
+        if duplicates:
+            timings.append(f'dup;desc="{sum(duplicates.values())} repeated queries"')
+        response['Server-Timing'] = ', '.join(timings)
+        return response
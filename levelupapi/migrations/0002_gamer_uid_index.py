@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('levelupapi', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='event',
+            name='game',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='levelupapi.game'),
+        ),
+        migrations.AlterField(
+            model_name='eventgamer',
+            name='event',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendees', to='levelupapi.event'),
+        ),
+        migrations.AlterField(
+            model_name='game',
+            name='game_type',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='games', to='levelupapi.gametype'),
+        ),
+        migrations.AlterField(
+            model_name='game',
+            name='gamer',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='games', to='levelupapi.gamer'),
+        ),
+        migrations.AlterField(
+            model_name='game',
+            name='maker',
+            field=models.CharField(max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='game',
+            name='title',
+            field=models.CharField(max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='gamer',
+            name='uid',
+            field=models.CharField(db_index=True, max_length=50),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:42
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_memberships(apps, schema_editor):
+    """Keeps the oldest row of every (event, gamer) pair so the unique constraint can be added"""
+    EventGamer = apps.get_model('levelupapi', 'EventGamer')
+    duplicates = (
+        EventGamer.objects.values('event', 'gamer')
+        .annotate(rows=Count('id'), keep=Min('id'))
+        .filter(rows__gt=1)
+    )
+    for duplicate in duplicates.iterator():
+        EventGamer.objects.filter(
+            event=duplicate['event'], gamer=duplicate['gamer']
+        ).exclude(id=duplicate['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('levelupapi', '0002_gamer_uid_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_memberships, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='eventgamer',
+            constraint=models.UniqueConstraint(fields=('event', 'gamer'), name='unique_event_gamer'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:58
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_of(queryset, column):
+    """The number of rows of queryset (filtered on OuterRef('pk')) per column, 0 when there are none"""
+    counts = queryset.values(column).annotate(count=models.Count('*')).values('count')
+    return Coalesce(models.Subquery(counts), 0)
+
+
+def count_existing_rows(apps, schema_editor):
+    """Fills the new counters from the memberships and events already stored"""
+    Event = apps.get_model('levelupapi', 'Event')
+    EventGamer = apps.get_model('levelupapi', 'EventGamer')
+    Game = apps.get_model('levelupapi', 'Game')
+    Event.objects.update(attendees_count=count_of(
+        EventGamer.objects.filter(event=models.OuterRef('pk')), 'event'))
+    Game.objects.update(event_count=count_of(
+        Event.objects.filter(game=models.OuterRef('pk')), 'game'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('levelupapi', '0005_event_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='attendees_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='event_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_existing_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('levelupapi', '0007_edit_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist', to='levelupapi.event')),
+                ('gamer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='levelupapi.gamer')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['event', 'id'], name='waitlist_event_id_idx')],
+                'constraints': [models.UniqueConstraint(fields=('event', 'gamer'), name='unique_waitlist_entry')],
+            },
+        ),
+    ]
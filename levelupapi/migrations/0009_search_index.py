@@ -0,0 +1,36 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Creates the FTS5 table behind levelupapi.search.SqliteFTSBackend and indexes the rows already
+    stored. Other databases search with DatabaseBackend, which needs no table.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    # prefix='2 3' keeps prefix indexes so typeahead queries of 2 and 3 characters don't scan the terms
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE levelupapi_search USING fts5("
+        "title, extra, prefix='2 3', tokenize='unicode61 remove_diacritics 2')"
+    )
+    # rowid is pk * 2 + 0 for games and pk * 2 + 1 for events (see levelupapi.search.Document)
+    schema_editor.execute(
+        "INSERT INTO levelupapi_search (rowid, title, extra) SELECT id * 2, title, maker FROM levelupapi_game")
+    schema_editor.execute(
+        "INSERT INTO levelupapi_search (rowid, title, extra) SELECT id * 2 + 1, description, '' FROM levelupapi_event")
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE levelupapi_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('levelupapi', '0008_waitlist'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
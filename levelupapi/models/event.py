@@ -1,12 +1,86 @@
 from django.db import models
 from .game import Game
 from .gamer import Gamer
+from .expressions import SubqueryCount
+
+
+class EventQuerySet(models.QuerySet):
+    """
+    A custom QuerySet with the lookups used by the event views.
+    """
+
+    def with_related(self):
+        """
+        Joins the game (with its game type and gamer) and the organizer into the same query,
+        so rendering the nested relations does not cost extra queries per event.
+        """
+        return self.select_related('game__game_type', 'game__gamer', 'organizer')
+
+    def with_attendance(self, gamer):
+        """
+        Annotates each event with joined, the number of times gamer joined it (0 or 1).
+        The number of attendees is stored on the event (attendees_count).
+        """
+        from .event_gamer import EventGamer  # event_gamer.py imports this module
+
+        attendees = EventGamer.objects.filter(event=models.OuterRef('pk')).values('pk')
+        return self.annotate(joined=SubqueryCount(attendees.filter(gamer=gamer)))
+
+    def recount_attendees(self):
+        """
+        Recomputes attendees_count from the memberships, for the paths that bypass the signals
+        keeping it up to date (bulk_create, queryset updates) and for repairs.
+        Returns the number of events updated.
+        """
+        return self.update(attendees_count=self.attendee_subquery())
+
+    def stale_attendee_counts(self):
+        """Returns the events whose attendees_count doesn't match their memberships"""
+        return self.annotate(actual_count=self.attendee_subquery()).exclude(
+            attendees_count=models.F('actual_count'))
+
+    @staticmethod
+    def attendee_subquery():
+        from .event_gamer import EventGamer  # event_gamer.py imports this module
+
+        return SubqueryCount(EventGamer.objects.filter(event=models.OuterRef('pk')).values('pk'))
+
+    def joined_by(self, gamer, joined=True):
+        """
+        Keeps the events gamer joined (or, with joined=False, the ones gamer didn't join).
+        The memberships are looked up through their gamer index rather than by counting
+        the attendees of every event.
+        """
+        from .event_gamer import EventGamer  # event_gamer.py imports this module
+
+        memberships = EventGamer.objects.filter(gamer=gamer).values('event_id')
+        if joined:
+            return self.filter(pk__in=memberships)
+        return self.exclude(pk__in=memberships)
+
+    def upcoming(self, today):
+        """Keeps the events on or after today"""
+        return self.filter(date__gte=today)
+
+
+class EventManager(models.Manager.from_queryset(EventQuerySet)):
+    """
+    The default manager: leaves out the events soft-deleted by levelupapi.deletion, which the
+    purge_deleted command removes later. `all_objects` includes them.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 
 class Event(models.Model):
     """
     A model that represents an event.
     """
 
+    objects = EventManager()
+    all_objects = EventQuerySet.as_manager()
+
     game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='events')
     """
     A ForeignKey field that represents a one-to-many relationship between Game and Event.
@@ -34,7 +108,43 @@ class Event(models.Model):
     A ForeignKey field that represents a one-to-many relationship between Gamer and Event.
     When a Gamer is deleted, all related Event instances will also be deleted due to the on_delete=models.CASCADE argument.
     """
+
+    attendees_count = models.PositiveIntegerField(default=0, editable=False)
+    """
+    The number of gamers who joined the event, kept in step with EventGamer by the signals in levelupapi/signals.py.
+    recount_attendees() (and the repair_counters command) rebuild it from the memberships.
+    """
+
+    version = models.PositiveIntegerField(default=1, editable=False)
+    """
+    Incremented by every edit through the update endpoints, which send it as the ETag and refuse
+    an If-Match naming an older one, so concurrent edits can't overwrite each other.
+    """
+
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+    """
+    When the event was soft-deleted: it's hidden from `objects` right away and removed with its
+    memberships by the purge_deleted command.
+    """
     
+    class Meta:
+        indexes = [
+            # Ordering and keyset pagination of the event list
+            models.Index(fields=['date', 'time', 'id'], name='event_date_time_idx'),
+            # Count('events', filter=Q(events__organizer=gamer)) in the game list
+            models.Index(fields=['game', 'organizer'], name='event_game_organizer_idx'),
+            # The ?game= and ?organizer= filters of the event list, in list order
+            models.Index(fields=['game', 'date', 'time', 'id'], name='event_game_date_idx'),
+            models.Index(fields=['organizer', 'date', 'time', 'id'], name='event_organizer_date_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembers the stored game, so moving the event to another game can move its count too
+        instance.saved_game_id = instance.__dict__.get('game_id')
+        return instance
+
     @property
     def joined(self):
         """Custom Property that returns 'joined' attribute"""
@@ -19,3 +19,10 @@ class EventGamer(models.Model):
     When an Event is deleted, all related EventGamer instances will also be deleted due to the on_delete=models.CASCADE argument.
     The 'related_name' argument is used to specify the reverse relation from Event to EventGamer, allowing you to access all EventGamer instances related to an Event instance using the 'attendees' attribute.
     """
+
+    class Meta:
+        constraints = [
+            # A gamer joins an event once. Leading with event makes the index cover the
+            # event -> attendees join that the attendees_count/joined annotations run.
+            models.UniqueConstraint(fields=['event', 'gamer'], name='unique_event_gamer'),
+        ]
@@ -0,0 +1,14 @@
+from django.db import models
+
+
+class SubqueryCount(models.Subquery):
+    """
+    Counts the rows of a correlated queryset, e.g.
+    SubqueryCount(EventGamer.objects.filter(event=OuterRef('pk')).values('pk')).
+
+    Unlike Count() over a join, this doesn't GROUP BY the outer query, so an ordered and
+    LIMITed outer query can walk its index and stop after one page.
+    """
+
+    template = '(SELECT COUNT(*) FROM (%(subquery)s) _count)'
+    output_field = models.IntegerField()
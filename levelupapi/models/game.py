@@ -1,12 +1,79 @@
 from django.db import models
 from .gamer import Gamer
 from .game_type import GameType
+from .expressions import SubqueryCount
+
+
+class GameQuerySet(models.QuerySet):
+    """
+    A custom QuerySet with the lookups used by the game views.
+    """
+
+    def with_related(self):
+        """
+        Joins the game type and gamer into the same query, so rendering the nested relations
+        does not cost extra queries per game.
+        """
+        return self.select_related('game_type', 'gamer')
+
+    def with_event_info(self):
+        """
+        Fetches the events behind `event_info` for every game in one batched query.
+        Only the columns the summary needs are loaded.
+        """
+        from .event import Event  # event.py imports this module
+
+        events = Event.objects.only('game', 'description', 'date', 'time')
+        return self.prefetch_related(models.Prefetch('events', queryset=events))
+
+    def with_event_counts(self, gamer):
+        """
+        Annotates each game with user_event_count, the number of its events organized by gamer.
+        The number of all its events is stored on the game (event_count).
+        """
+        from .event import Event  # event.py imports this module
+
+        events = Event.objects.filter(game=models.OuterRef('pk'), organizer=gamer).values('pk')
+        return self.annotate(user_event_count=SubqueryCount(events))
+
+    def recount_events(self):
+        """
+        Recomputes event_count from the events, for the paths that bypass the signals keeping
+        it up to date (bulk_create, queryset updates) and for repairs.
+        Returns the number of games updated.
+        """
+        return self.update(event_count=self.event_subquery())
+
+    def stale_event_counts(self):
+        """Returns the games whose event_count doesn't match their events"""
+        return self.annotate(actual_count=self.event_subquery()).exclude(
+            event_count=models.F('actual_count'))
+
+    @staticmethod
+    def event_subquery():
+        from .event import Event  # event.py imports this module
+
+        return SubqueryCount(Event.objects.filter(game=models.OuterRef('pk')).values('pk'))
+
+
+class GameManager(models.Manager.from_queryset(GameQuerySet)):
+    """
+    The default manager: leaves out the games soft-deleted by levelupapi.deletion, which the
+    purge_deleted command removes later. `all_objects` includes them.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 
 class Game(models.Model):
     """
     A model that represents a game.
     """
 
+    objects = GameManager()
+    all_objects = GameQuerySet.as_manager()
+
     game_type = models.ForeignKey(GameType, on_delete=models.CASCADE, related_name='games')
     """
     A ForeignKey field that represents a one-to-many relationship between GameType and Game.
@@ -41,10 +108,33 @@ class Game(models.Model):
     An IntegerField that stores the skill level required to play the game.
     """
 
+    event_count = models.PositiveIntegerField(default=0, editable=False)
+    """
+    The number of events for the game, kept in step with Event by the signals in levelupapi/signals.py.
+    recount_events() (and the repair_counters command) rebuild it from the events.
+    """
+
+    version = models.PositiveIntegerField(default=1, editable=False)
+    """
+    Incremented by every edit through the update endpoints (see Event.version).
+    """
+
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+    """
+    When the game was soft-deleted, along with its events (see Event.deleted_at).
+    """
+
+    class Meta:
+        indexes = [
+            # The ?type= filter of the game list, kept in id order for keyset pagination
+            models.Index(fields=['game_type', 'id'], name='game_type_id_idx'),
+        ]
+
     @property
     def event_info(self):
         """
         A custom property that returns a list of event-specific information.
+        Uses the events attached by `with_event_info()` when present, otherwise queries them.
         """
         info = []
         for event in self.events.all():
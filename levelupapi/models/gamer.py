@@ -2,5 +2,10 @@ from django.db import models
 
 class Gamer(models.Model):
 
-    uid = models.CharField(max_length=50)
+    uid = models.CharField(max_length=50, db_index=True)
     bio = models.CharField(max_length=50)
+
+    @property
+    def is_authenticated(self):
+        """Lets DRF treat a gamer resolved from the Authorization header as request.user"""
+        return True
@@ -0,0 +1,31 @@
+from django.db import models
+from .gamer import Gamer
+from .event import Event
+
+class WaitlistEntry(models.Model):
+    """
+    A model that represents a gamer waiting for a seat at a full event.
+    Entries are promoted to EventGamer in the order they were created (by id) as seats free up.
+    """
+
+    gamer = models.ForeignKey(Gamer, on_delete=models.CASCADE)
+    """
+    A ForeignKey field that represents a one-to-many relationship between Gamer and WaitlistEntry.
+    When a Gamer is deleted, all related WaitlistEntry instances will also be deleted due to the on_delete=models.CASCADE argument.
+    """
+
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='waitlist')
+    """
+    A ForeignKey field that represents a one-to-many relationship between Event and WaitlistEntry.
+    When an Event is deleted, all related WaitlistEntry instances will also be deleted due to the on_delete=models.CASCADE argument.
+    """
+
+    class Meta:
+        constraints = [
+            # A gamer waits for an event once
+            models.UniqueConstraint(fields=['event', 'gamer'], name='unique_waitlist_entry'),
+        ]
+        indexes = [
+            # The head of an event's waitlist, and a gamer's position in it
+            models.Index(fields=['event', 'id'], name='waitlist_event_id_idx'),
+        ]
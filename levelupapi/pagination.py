@@ -0,0 +1,146 @@
+"""Keyset (cursor) pagination for the list views"""
+import base64
+import binascii
+import json
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginates a queryset by seeking past the last row of the previous page instead of using OFFSET,
+    so deep pages cost the same as the first one.
+
+    The cursor is an opaque, url-safe encoding of the ordering values of the last row served.
+    The ordering fields may be descending ('-date') and must end with a unique field (usually 'id').
+
+    Pagination is opt-in per request with ?page_size= or ?cursor=, so existing clients keep
+    receiving the full list. Setting REST_FRAMEWORK['PAGE_SIZE'] paginates every request.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    default_page_size = 50
+    max_page_size = 500
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering=('id',)):
+        self.ordering = tuple(ordering)
+        self.fields = tuple(name.lstrip('-') for name in self.ordering)
+        self.next_values = None
+        self.request = None
+        self.page_size = None
+
+    def get_page_size(self, request):
+        """Returns the requested page size, or None when the request isn't paginated"""
+        page_size = request.query_params.get(self.page_size_query_param)
+        if page_size is None:
+            if api_settings.PAGE_SIZE:
+                return api_settings.PAGE_SIZE
+            if self.cursor_query_param not in request.query_params:
+                return None
+            return self.default_page_size
+        try:
+            page_size = int(page_size)
+        except ValueError:
+            return self.default_page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def encode_cursor(self, values):
+        """Encodes the ordering values of a row as an opaque cursor"""
+        raw = json.dumps(values, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, model, cursor):
+        """Decodes a cursor back into python values for the ordering fields"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError(cursor)
+            return [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (TypeError, ValueError, ValidationError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def seek(self, values):
+        """
+        Builds the filter for rows after values in the ordering, i.e. the expansion of
+        (a, b, c) > (x, y, z) as (a > x) OR (a = x AND b > y) OR (a = x AND b = y AND c > z),
+        with < for the descending fields.
+        """
+        condition = Q()
+        for i, name in enumerate(self.ordering):
+            ties = dict(zip(self.fields[:i], values[:i]))
+            lookup = f'{name[1:]}__lt' if name.startswith('-') else f'{name}__gt'
+            condition |= Q(**ties, **{lookup: values[i]})
+        return condition
+
+    def get_page_queryset(self, queryset, request):
+        """
+        Returns queryset ordered, moved past the cursor and sliced to one row more than a page,
+        or None when the request isn't paginated
+        """
+        page_size = self.get_page_size(request)
+        if page_size is None:
+            return None
+
+        self.request = request
+        self.page_size = page_size
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self.seek(self.decode_cursor(queryset.model, cursor)))
+
+        # Fetch one extra row to find out whether there is a next page
+        return queryset[:page_size + 1]
+
+    def get_page(self, rows):
+        """
+        Trims the rows fetched from get_page_queryset() to a page and remembers where the next one
+        starts. Rows may be model instances or the dicts of a values() queryset.
+        """
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            last = rows[-1]
+            if isinstance(last, dict):
+                self.next_values = [last[name] for name in self.fields]
+            else:
+                self.next_values = [getattr(last, name) for name in self.fields]
+        else:
+            self.next_values = None
+        return rows
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.get_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request):
+        """The same as paginate_queryset(), fetching the page with the async ORM"""
+        queryset = self.get_page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.get_page([row async for row in queryset])
+
+    def get_next_link(self):
+        """Returns the url of the next page, or None on the last page"""
+        if self.next_values is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_values))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
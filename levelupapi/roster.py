@@ -0,0 +1,237 @@
+"""
+Live roster updates, pushed to clients as Server-Sent Events by GET /events/stream under ASGI
+(see levelupapi.views.asynchronous.event_stream) instead of having them poll the event list.
+
+Writes publish small messages once their transaction commits:
+
+    {"type": "signup" | "leave", "event": id, "attendees_count": n}
+    {"type": "update", "event": id, "version": n}
+    {"type": "delete", "event": id}
+
+A signup or leave also carries the gamer behind it, which is only passed on, as "joined", to that
+gamer's own streams. The broker (LEVELUP_ROSTER_BROKER) carries the messages to every worker,
+where the hub fans them out to the streams open in that process.
+"""
+import asyncio
+import json
+import threading
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+from levelupapi.cache import get_cache
+from levelupapi.models import Event
+
+RESYNC = {'type': 'resync'}
+"""Sent instead of the messages a subscriber was too slow to take: refetch the event list"""
+
+
+class Subscriber:
+    """
+    One open stream: the gamer reading it, the events it follows (None for all of them) and a
+    bounded queue of the messages waiting to be sent. It belongs to the event loop that created it.
+    """
+
+    def __init__(self, gamer_id, event_ids=None, maxsize=100):
+        self.gamer_id = gamer_id
+        self.event_ids = event_ids
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+
+    def deliver(self, message):
+        """Queues message; runs on self.loop. A full queue is replaced by a single RESYNC"""
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            message = RESYNC
+        self.queue.put_nowait(message)
+
+    def render(self, message):
+        """Returns message as a Server-Sent Event, telling the gamer whether they joined when it's theirs"""
+        data = {key: value for key, value in message.items() if key != 'gamer'}
+        if message.get('gamer') == self.gamer_id:
+            data['joined'] = message['type'] == 'signup'
+        return f'event: {message["type"]}\ndata: {json.dumps(data)}\n\n'.encode()
+
+
+class RosterHub:
+    """
+    Fans messages out to the subscribers of this process. Subscribers are indexed by the event they
+    follow, so a message only touches the streams that want it, and an idle subscriber costs no more
+    than its queue. Messages may be dispatched from any thread: they are handed to each event loop
+    with a single call_soon_threadsafe().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_event = {}
+        self._everything = set()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._everything) + sum(len(subscribers) for subscribers in self._by_event.values())
+
+    def subscribe(self, gamer_id, event_ids=None):
+        """Returns a new Subscriber of this hub; call from the event loop that will read it"""
+        subscriber = Subscriber(gamer_id, event_ids, getattr(settings, 'LEVELUP_ROSTER_QUEUE_SIZE', 100))
+        with self._lock:
+            if event_ids is None:
+                self._everything.add(subscriber)
+            for event_id in event_ids or ():
+                self._by_event.setdefault(event_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._everything.discard(subscriber)
+            for event_id in subscriber.event_ids or ():
+                subscribers = self._by_event.get(event_id, set())
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    self._by_event.pop(event_id, None)
+
+    def dispatch(self, message):
+        """Delivers message to the subscribers of its event"""
+        with self._lock:
+            subscribers = [*self._everything, *self._by_event.get(message['event'], ())]
+        by_loop = {}
+        for subscriber in subscribers:
+            by_loop.setdefault(subscriber.loop, []).append(subscriber)
+        for loop, targets in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_deliver, targets, message)
+            except RuntimeError:
+                pass  # the loop was closed along with its streams
+
+
+def _deliver(subscribers, message):
+    for subscriber in subscribers:
+        subscriber.deliver(message)
+
+
+hub = RosterHub()
+
+
+class LocalBroker:
+    """Hands messages straight to the hub of this process. Enough when a single worker serves the streams."""
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    @property
+    def active(self):
+        """False while nobody listens, so writes skip building messages (always the case under WSGI)"""
+        return len(self.hub) > 0
+
+    def publish(self, messages):
+        for message in messages:
+            self.hub.dispatch(message)
+
+    def start(self):
+        """Called by each new stream, from its event loop"""
+
+
+class CacheBroker(LocalBroker):
+    """
+    Relays messages between workers through the shared cache (LEVELUP_CACHE_BACKEND=file, or a cache
+    server), a stand-in for a pub/sub server. Messages are stored under increasing sequence numbers
+    for LEVELUP_ROSTER_MESSAGE_TTL seconds; each worker runs one task that polls for new ones every
+    LEVELUP_ROSTER_POLL_INTERVAL seconds, however many streams it serves, and dispatches them to its hub.
+    Caches without an atomic incr() (the file cache) may drop a message under concurrent writes.
+    """
+
+    SEQUENCE_KEY = 'levelup:roster:sequence'
+    MAX_BACKLOG = 1000
+    active = True  # streams on other workers may be listening
+
+    def __init__(self, hub):
+        super().__init__(hub)
+        self.task = None
+
+    @staticmethod
+    def message_key(sequence):
+        return f'levelup:roster:message:{sequence}'
+
+    def publish(self, messages):
+        cache = get_cache()
+        cache.add(self.SEQUENCE_KEY, 0, timeout=None)
+        ttl = getattr(settings, 'LEVELUP_ROSTER_MESSAGE_TTL', 60)
+        for message in messages:
+            cache.set(self.message_key(cache.incr(self.SEQUENCE_KEY)), message, timeout=ttl)
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done() or self.task.get_loop() is not loop:
+            self.task = loop.create_task(self.poll())
+
+    async def poll(self):
+        cache = get_cache()
+        interval = getattr(settings, 'LEVELUP_ROSTER_POLL_INTERVAL', 1.0)
+        seen = await cache.aget(self.SEQUENCE_KEY, 0)
+        while len(self.hub):
+            await asyncio.sleep(interval)
+            latest = await cache.aget(self.SEQUENCE_KEY, 0)
+            if latest < seen:
+                seen = latest  # the cache was cleared
+            first = max(seen + 1, latest - self.MAX_BACKLOG + 1)
+            keys = [self.message_key(sequence) for sequence in range(first, latest + 1)]
+            found = await cache.aget_many(keys) if keys else {}
+            for key in keys:
+                if key in found:
+                    self.hub.dispatch(found[key])
+            seen = latest
+
+
+_brokers = {}
+
+
+def get_broker():
+    """Returns the broker named by LEVELUP_ROSTER_BROKER, one per process"""
+    path = getattr(settings, 'LEVELUP_ROSTER_BROKER', 'levelupapi.roster.LocalBroker')
+    if path not in _brokers:
+        _brokers[path] = import_string(path)(hub)
+    return _brokers[path]
+
+
+def publish(*messages):
+    """Sends messages to the streams of every worker once the current transaction commits"""
+    broker = get_broker()
+    if broker.active:
+        transaction.on_commit(lambda: broker.publish(messages))
+
+
+def publish_attendance(event_ids, gamer_id, joined):
+    """Publishes the attendees_count of event_ids once the signup (or leave) of gamer_id commits"""
+    broker = get_broker()
+    if not event_ids or not broker.active:
+        return
+
+    def send():
+        counts = Event.objects.filter(pk__in=event_ids).values_list('id', 'attendees_count')
+        broker.publish([
+            {'type': 'signup' if joined else 'leave', 'event': event_id,
+             'attendees_count': attendees_count, 'gamer': gamer_id}
+            for event_id, attendees_count in counts
+        ])
+
+    transaction.on_commit(send)
+
+
+async def stream(gamer_id, event_ids=None):
+    """
+    Yields the Server-Sent Events of a new subscriber until the client goes away, with a comment
+    every LEVELUP_ROSTER_HEARTBEAT seconds so proxies keep the idle connection open.
+    """
+    subscriber = hub.subscribe(gamer_id, event_ids)
+    get_broker().start()
+    heartbeat = getattr(settings, 'LEVELUP_ROSTER_HEARTBEAT', 15)
+    try:
+        yield b'retry: 3000\n\n'
+        while True:
+            try:
+                message = await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield b': keepalive\n\n'
+                continue
+            yield subscriber.render(message)
+    finally:
+        hub.unsubscribe(subscriber)
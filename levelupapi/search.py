@@ -0,0 +1,179 @@
+"""
+Full-text and prefix search over game titles and makers and event descriptions.
+
+Rows are indexed as documents by a backend chosen with LEVELUP_SEARCH_BACKEND. On sqlite it's an
+FTS5 table (created by migration 0009), kept up to date by the receivers in levelupapi.signals as
+rows are saved and deleted; the paths that bypass the signals (queryset updates, bulk imports)
+call index() or rebuild() themselves. DatabaseBackend searches the tables with LIKE instead, for
+databases without FTS5, at the cost of a scan per query.
+"""
+import re
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, When
+from django.utils.module_loading import import_string
+from levelupapi.models import Event, Game
+
+
+class Document:
+    """
+    How the rows of model are indexed: kind names them in results, code tells them apart in the
+    index (FTS5 rowids are pk * 2 + code) and title and extra are the columns searched, the title
+    weighing most.
+    """
+
+    def __init__(self, kind, model, code, title, extra=None):
+        self.kind = kind
+        self.model = model
+        self.code = code
+        self.title = title
+        self.extra = extra
+
+    def rows(self, queryset):
+        """Returns the (pk, title, extra) of the rows of queryset"""
+        if self.extra:
+            return list(queryset.values_list('id', self.title, self.extra))
+        return [(pk, title, '') for pk, title in queryset.values_list('id', self.title)]
+
+    def rows_of(self, instances):
+        """Returns the (pk, title, extra) of saved instances, without a query"""
+        return [
+            (instance.pk, getattr(instance, self.title), getattr(instance, self.extra) if self.extra else '')
+            for instance in instances
+        ]
+
+
+DOCUMENTS = {
+    'games': Document('games', Game, 0, 'title', 'maker'),
+    'events': Document('events', Event, 1, 'description'),
+}
+
+DOCUMENT_OF = {document.model: document for document in DOCUMENTS.values()}
+
+
+def terms(query):
+    """Splits a query into the words it searches for"""
+    return re.findall(r'\w+', query.lower())
+
+
+class DatabaseBackend:
+    """
+    Searches the tables themselves: matches of every word, anywhere in the columns, with the rows
+    whose title starts with the query first. Works everywhere, but scans the tables.
+    """
+
+    def index(self, document, rows):
+        pass
+
+    def remove(self, document, pks):
+        pass
+
+    def rebuild(self, documents=None):
+        pass
+
+    def search(self, query, documents, limit):
+        """Returns {kind: [pk, ...]} of the best matches of query, best first"""
+        words = terms(query)
+        results = {document.kind: [] for document in documents}
+        if not words:
+            return results
+        for document in documents:
+            matches = Q()
+            for word in words:
+                word_matches = Q(**{f'{document.title}__icontains': word})
+                if document.extra:
+                    word_matches |= Q(**{f'{document.extra}__icontains': word})
+                matches &= word_matches
+            rank = Case(
+                When(**{f'{document.title}__istartswith': query.strip()}, then=0),
+                default=1, output_field=IntegerField(),
+            )
+            queryset = document.model.objects.filter(matches).annotate(rank=rank).order_by('rank', 'id')
+            results[document.kind] = list(queryset.values_list('id', flat=True)[:limit])
+        return results
+
+
+class SqliteFTSBackend(DatabaseBackend):
+    """
+    Searches the FTS5 table levelupapi_search. Every word but the last must match a whole word;
+    the last one is a prefix, answered from the table's prefix indexes, so typeahead works from
+    the second character. Matches are ranked with bm25, a title match weighing TITLE_WEIGHT times
+    one in the extra column.
+    """
+
+    TABLE = 'levelupapi_search'
+    TITLE_WEIGHT = 10.0
+
+    def index(self, document, rows):
+        """Adds (or replaces) the (pk, title, extra) rows of document"""
+        rows = list(rows)
+        if not rows:
+            return
+        self.remove(document, [pk for pk, _, _ in rows])
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.TABLE} (rowid, title, extra) VALUES (%s, %s, %s)',
+                [(pk * 2 + document.code, title, extra) for pk, title, extra in rows],
+            )
+
+    def remove(self, document, pks):
+        """Drops the rows of document with pks from the index"""
+        pks = list(pks)
+        if not pks:
+            return
+        with connection.cursor() as cursor:
+            for start in range(0, len(pks), 500):
+                rowids = [pk * 2 + document.code for pk in pks[start:start + 500]]
+                cursor.execute(
+                    f'DELETE FROM {self.TABLE} WHERE rowid IN ({", ".join(["%s"] * len(rowids))})', rowids)
+
+    def rebuild(self, documents=None):
+        """Reindexes every row of documents (all of them by default) from the tables"""
+        for document in documents or DOCUMENTS.values():
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {self.TABLE} WHERE rowid %% 2 = %s', [document.code])
+            queryset = document.model.objects.order_by('id')
+            last = 0
+            while rows := document.rows(queryset.filter(id__gt=last)[:2000]):
+                self.index(document, rows)
+                last = rows[-1][0]
+
+    @staticmethod
+    def match_expression(words):
+        """Returns the FTS5 query for words: quoted, so they're never read as operators, the last one as a prefix"""
+        quoted = [f'"{word}"' for word in words]
+        quoted[-1] += '*'
+        return ' '.join(quoted)
+
+    def search(self, query, documents, limit):
+        words = terms(query)
+        results = {document.kind: [] for document in documents}
+        if not words:
+            return results
+        with connection.cursor() as cursor:
+            for document in documents:
+                cursor.execute(
+                    f'SELECT rowid FROM {self.TABLE} WHERE {self.TABLE} MATCH %s AND rowid %% 2 = %s '
+                    f'ORDER BY bm25({self.TABLE}, %s, 1.0) LIMIT %s',
+                    [self.match_expression(words), document.code, self.TITLE_WEIGHT, limit],
+                )
+                results[document.kind] = [rowid // 2 for rowid, in cursor.fetchall()]
+        return results
+
+
+_backends = {}
+
+
+def get_backend():
+    """Returns the backend named by LEVELUP_SEARCH_BACKEND (FTS5 on sqlite, LIKE elsewhere)"""
+    default = 'levelupapi.search.SqliteFTSBackend' if connection.vendor == 'sqlite' else 'levelupapi.search.DatabaseBackend'
+    path = getattr(settings, 'LEVELUP_SEARCH_BACKEND', None) or default
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
+
+
+def reindex(model, pks):
+    """Reindexes the rows pks of model from the table, for writes that bypass the signals"""
+    document = DOCUMENT_OF[model]
+    get_backend().index(document, document.rows(model.objects.filter(pk__in=pks)))
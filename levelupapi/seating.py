@@ -0,0 +1,98 @@
+"""
+Event capacity. An event seats as many gamers as its game's number_of_players; the others wait on
+its waitlist and are seated first come, first served as seats free up.
+
+Counting the attendees and then inserting lets concurrent signups all see the last seat as free.
+Instead, the event rows are locked (SELECT ... FOR UPDATE) before their attendees_count is read,
+and the memberships are inserted and counted before the lock is released at commit, so concurrent
+signups for the same event queue on its row and each one sees the seats the previous ones took.
+"""
+from django.db import transaction
+from django.db.models import Count, F
+from levelupapi import roster
+from levelupapi.cache import bump_dashboards, bump_version
+from levelupapi.models import Event, EventGamer, WaitlistEntry
+
+JOINED = 'added'
+ALREADY_JOINED = 'already_joined'
+WAITLISTED = 'waitlisted'
+ALREADY_WAITLISTED = 'already_waitlisted'
+
+
+def free_seats(event_ids):
+    """
+    Locks the rows of event_ids until the transaction ends and returns {event id: free seats}.
+    Rows are locked in id order, so requests locking several events can't deadlock each other.
+    """
+    events = (
+        Event.objects.select_for_update(of=('self',)).filter(pk__in=event_ids).order_by('id')
+        .values_list('id', 'attendees_count', 'game__number_of_players')
+    )
+    return {event_id: capacity - attendees_count for event_id, attendees_count, capacity in events}
+
+
+def join(gamer_id, event_ids):
+    """
+    Seats the gamer at each of event_ids with a free seat and puts them on the waitlist of the
+    full ones, in a constant number of queries. A free seat only goes to a new signup when
+    nobody is waiting for it. Returns {event id: status} for the events that exist.
+    """
+    with transaction.atomic():
+        free = free_seats(event_ids)
+        joined = set(EventGamer.objects.filter(gamer_id=gamer_id, event_id__in=free).values_list('event_id', flat=True))
+        waiting = set(WaitlistEntry.objects.filter(gamer_id=gamer_id, event_id__in=free).values_list('event_id', flat=True))
+        queued = dict(
+            WaitlistEntry.objects.filter(event_id__in=free).values('event_id')
+            .annotate(entries=Count('id')).values_list('event_id', 'entries')
+        )
+
+        statuses = {}
+        for event_id in free:
+            if event_id in joined:
+                statuses[event_id] = ALREADY_JOINED
+            elif event_id in waiting:
+                statuses[event_id] = ALREADY_WAITLISTED
+            elif free[event_id] > queued.get(event_id, 0):
+                statuses[event_id] = JOINED
+            else:
+                statuses[event_id] = WAITLISTED
+
+        seated = [event_id for event_id, status in statuses.items() if status == JOINED]
+        waitlisted = [event_id for event_id, status in statuses.items() if status == WAITLISTED]
+        if seated:
+            # bulk_create doesn't send post_save: count the seats and publish them here
+            EventGamer.objects.bulk_create([EventGamer(gamer_id=gamer_id, event_id=event_id) for event_id in seated])
+            Event.objects.filter(pk__in=seated).update(attendees_count=F('attendees_count') + 1)
+            bump_version('events')
+            bump_dashboards(gamer_id)
+            roster.publish_attendance(seated, gamer_id, joined=True)
+        if waitlisted:
+            WaitlistEntry.objects.bulk_create([WaitlistEntry(gamer_id=gamer_id, event_id=event_id) for event_id in waitlisted])
+    return statuses
+
+
+def waitlist_position(event_id, gamer_id):
+    """Returns the 1-based place of the gamer in the event's waitlist"""
+    entry_id = WaitlistEntry.objects.filter(event_id=event_id, gamer_id=gamer_id).values('id')
+    return WaitlistEntry.objects.filter(event_id=event_id, id__lte=entry_id).count()
+
+
+def promote_waitlist(event_ids):
+    """
+    Seats the gamers at the head of the waitlists of event_ids in the seats free there: call after
+    seats free up (a leave) or capacity grows (the game's number_of_players, or the event's game, changes).
+    """
+    with transaction.atomic():
+        free = {event_id: seats for event_id, seats in free_seats(event_ids).items() if seats > 0}
+        waiting = WaitlistEntry.objects.filter(event_id__in=free).values_list('event_id', flat=True).distinct()
+        for event_id in set(waiting):
+            entries = list(
+                WaitlistEntry.objects.filter(event_id=event_id).order_by('id').values_list('id', 'gamer_id')[:free[event_id]]
+            )
+            EventGamer.objects.bulk_create([EventGamer(gamer_id=gamer_id, event_id=event_id) for _, gamer_id in entries])
+            Event.objects.filter(pk=event_id).update(attendees_count=F('attendees_count') + len(entries))
+            WaitlistEntry.objects.filter(id__in=[entry_id for entry_id, _ in entries]).delete()
+            bump_version('events')
+            bump_dashboards(*[gamer_id for _, gamer_id in entries])
+            for _, gamer_id in entries:
+                roster.publish_attendance([event_id], gamer_id, joined=True)
@@ -0,0 +1,169 @@
+"""
+Signal receivers that keep the levelupapi caches and stored counters in step with the database
+and tune connections
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models import F, QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from levelupapi.authentication import gamer_cache
+from levelupapi import roster, search
+from levelupapi.cache import bump_dashboards, bump_version
+from levelupapi.models import Event, EventGamer, Game, Gamer, GameType
+
+
+@receiver(post_save, sender=Gamer)
+@receiver(post_delete, sender=Gamer)
+def forget_gamer(sender, instance, created=False, **kwargs):
+    """
+    Drops the cached identity of a gamer that was created, changed or deleted.
+    Event and game lists embed gamers, so they are invalidated unless the gamer is brand new.
+    """
+    gamer_cache.delete(instance.uid)
+    if not created:
+        bump_version('events', 'games')
+
+
+@receiver(post_save, sender=GameType)
+@receiver(post_delete, sender=GameType)
+def invalidate_game_types(sender, **kwargs):
+    """Invalidates the cached game type responses and the lists that embed game types"""
+    bump_version('gametypes', 'events', 'games')
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+def invalidate_catalog(sender, **kwargs):
+    """Advances the version behind the event and game list ETags"""
+    bump_version('events', 'games')
+
+
+@receiver(post_save, sender=EventGamer)
+@receiver(post_delete, sender=EventGamer)
+def invalidate_attendance(sender, **kwargs):
+    """Advances the version behind the event list ETags; game lists don't show attendance"""
+    bump_version('events')
+
+
+@receiver(post_save, sender=EventGamer)
+@receiver(post_delete, sender=EventGamer)
+def invalidate_attendee_dashboard(sender, instance, **kwargs):
+    """Invalidates the dashboard (joined events) of the gamer who joined or left"""
+    bump_dashboards(instance.gamer_id)
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_organizer_dashboard(sender, instance, **kwargs):
+    """Invalidates the dashboard (organized events) of the organizer of a saved or deleted event"""
+    bump_dashboards(instance.organizer_id)
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+def invalidate_owner_dashboard(sender, instance, **kwargs):
+    """Invalidates the dashboard (owned games) of the gamer who owns a saved or deleted game"""
+    bump_dashboards(instance.gamer_id)
+
+
+def deleted_model(origin):
+    """Returns the model whose delete() (of an instance or a queryset) started a cascade"""
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+
+def add_to_counter(queryset, field, amount):
+    """Adds amount to the counter field of the rows of queryset, in the database (never below 0)"""
+    if amount < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -amount})
+    queryset.update(**{field: F(field) + amount})
+
+
+@receiver(post_save, sender=EventGamer)
+def count_signup(sender, instance, created, raw=False, **kwargs):
+    """Counts a new membership in Event.attendees_count"""
+    if raw:
+        # loaddata: the row may already have been there, so recount instead of adding one
+        Event.all_objects.filter(pk=instance.event_id).recount_attendees()
+    elif created:
+        add_to_counter(Event.objects.filter(pk=instance.event_id), 'attendees_count', 1)
+        roster.publish_attendance([instance.event_id], instance.gamer_id, joined=True)
+
+
+@receiver(post_delete, sender=EventGamer)
+def count_leave(sender, instance, origin=None, **kwargs):
+    """Uncounts a deleted membership, unless it goes because its event (or the event's game) does"""
+    if deleted_model(origin) not in (Event, Game):
+        add_to_counter(Event.objects.filter(pk=instance.event_id), 'attendees_count', -1)
+        roster.publish_attendance([instance.event_id], instance.gamer_id, joined=False)
+
+
+@receiver(post_save, sender=Event)
+def count_event(sender, instance, created, raw=False, **kwargs):
+    """Counts a new event in Game.event_count, and moves the count when an event changes game"""
+    if raw:
+        # loaddata: recount the game, and the event itself, whose fixture may not carry its count
+        Game.all_objects.filter(pk=instance.game_id).recount_events()
+        Event.all_objects.filter(pk=instance.pk).recount_attendees()
+        return
+    saved_game_id = getattr(instance, 'saved_game_id', None)
+    if created:
+        add_to_counter(Game.objects.filter(pk=instance.game_id), 'event_count', 1)
+    elif saved_game_id is not None and saved_game_id != instance.game_id:
+        add_to_counter(Game.objects.filter(pk=saved_game_id), 'event_count', -1)
+        add_to_counter(Game.objects.filter(pk=instance.game_id), 'event_count', 1)
+    instance.saved_game_id = instance.game_id
+
+
+@receiver(post_delete, sender=Event)
+def uncount_event(sender, instance, origin=None, **kwargs):
+    """Uncounts a deleted event, unless it goes because its game does"""
+    if deleted_model(origin) is not Game:
+        add_to_counter(Game.objects.filter(pk=instance.game_id), 'event_count', -1)
+
+
+@receiver(post_save, sender=Game)
+def count_loaded_game(sender, instance, raw=False, **kwargs):
+    """Recounts the events of a game loaded by loaddata, whose fixture may not carry its count"""
+    if raw:
+        Game.all_objects.filter(pk=instance.pk).recount_events()
+
+
+@receiver(post_save, sender=Event)
+def push_event_change(sender, instance, created, raw=False, **kwargs):
+    """Tells the roster streams about an event saved with save() (the update views publish their own)"""
+    if not created and not raw:
+        roster.publish({'type': 'update', 'event': instance.pk, 'version': instance.version})
+
+
+@receiver(post_delete, sender=Event)
+def push_event_delete(sender, instance, **kwargs):
+    """Tells the roster streams an event is gone, however it was deleted"""
+    roster.publish({'type': 'delete', 'event': instance.pk})
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_save, sender=Event)
+def index_document(sender, instance, **kwargs):
+    """Adds a saved game or event to the search index, replacing what was indexed for it"""
+    document = search.DOCUMENT_OF[sender]
+    search.get_backend().index(document, document.rows_of([instance]))
+
+
+@receiver(post_delete, sender=Game)
+@receiver(post_delete, sender=Event)
+def unindex_document(sender, instance, **kwargs):
+    """Drops a deleted game or event from the search index"""
+    search.get_backend().remove(search.DOCUMENT_OF[sender], [instance.pk])
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    """Applies LEVELUP_SQLITE_PRAGMAS (WAL mode, relaxed fsync) to new sqlite connections"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in getattr(settings, 'LEVELUP_SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
@@ -0,0 +1,91 @@
+"""Streaming exports of the list endpoints"""
+from itertools import islice
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.compat import SHORT_SEPARATORS, LONG_SEPARATORS
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+
+EXPORT_FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+"""The ?export= formats: a JSON array (the same body as the list) or one JSON object per line"""
+
+encoder = JSONRenderer.encoder_class(
+    ensure_ascii=JSONRenderer.ensure_ascii,
+    allow_nan=not JSONRenderer.strict,
+    separators=SHORT_SEPARATORS if JSONRenderer.compact else LONG_SEPARATORS,
+)
+
+
+def encode(item):
+    """Encodes item exactly like DRF's JSONRenderer does"""
+    return encoder.encode(item).replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode()
+
+
+def export_format(query_params):
+    """Returns the format asked for with ?export=, or None for a regular response"""
+    requested = query_params.get('export')
+    if requested is not None and requested not in EXPORT_FORMATS:
+        raise ValidationError({'export': [f'Choose one of: {", ".join(EXPORT_FORMATS)}.']})
+    return requested
+
+
+class Export:
+    """
+    Renders every row of a values() queryset of a flat serializer as a stream of bytes in fmt.
+    Rows are read with iterator() and serialized LEVELUP_EXPORT_CHUNK_SIZE at a time, so the
+    memory a worker uses doesn't grow with the number of rows. The JSON array is byte for byte
+    the body of the unpaginated list.
+    """
+
+    def __init__(self, serializer, queryset, fmt):
+        self.serializer = serializer
+        self.queryset = queryset
+        self.fmt = fmt
+        self.chunk_size = getattr(settings, 'LEVELUP_EXPORT_CHUNK_SIZE', 2000)
+        self.started = False
+
+    def chunk(self, items):
+        """Returns the bytes of one chunk of serialized rows"""
+        encoded = [encode(item) for item in items]
+        if self.fmt == 'ndjson':
+            return b''.join(item + b'\n' for item in encoded)
+        opening = b',' if self.started else b'['
+        self.started = True
+        return opening + b','.join(encoded)
+
+    def end(self):
+        """Returns the bytes that close the stream"""
+        if self.fmt == 'ndjson':
+            return b''
+        return b']' if self.started else b'[]'
+
+    def __iter__(self):
+        rows = self.queryset.iterator(chunk_size=self.chunk_size)
+        while chunk := list(islice(rows, self.chunk_size)):
+            self.serializer.load(chunk)
+            yield self.chunk(self.serializer.serialize(chunk))
+        yield self.end()
+
+    async def __aiter__(self):
+        chunk = []
+        async for row in self.queryset.aiterator(chunk_size=self.chunk_size):
+            chunk.append(row)
+            if len(chunk) == self.chunk_size:
+                await self.serializer.aload(chunk)
+                yield self.chunk(self.serializer.serialize(chunk))
+                chunk = []
+        if chunk:
+            await self.serializer.aload(chunk)
+            yield self.chunk(self.serializer.serialize(chunk))
+        yield self.end()
+
+    def response(self, asynchronous=False):
+        """
+        Returns the streaming response. Under ASGI the rows must come from __aiter__, since
+        Django would read a synchronous iterator into memory before sending it.
+        """
+        content = self.__aiter__() if asynchronous else iter(self)
+        return StreamingHttpResponse(content, content_type=EXPORT_FORMATS[self.fmt])
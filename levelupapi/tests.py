@@ -1,3 +1,1133 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import io
+import json
+import os
+import re
+import tempfile
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.checks import run_checks
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from levelupapi import deletion, roster
+from levelupapi.authentication import LRUCache, gamer_cache
+from levelupapi.middleware import metrics
+from levelupapi.models import Event, EventGamer, Game, Gamer, GameType, WaitlistEntry
+from levelupapi.views.event import EventSerializer
+from levelupapi.views.game import GameSerializer
+
+
+class LevelupTestCase(TestCase):
+    """Shared fixtures for the levelupapi tests"""
+
+    def setUp(self):
+        gamer_cache.clear()
+        cache.clear()
+        self.gamer = Gamer.objects.create(uid='gamer-1', bio='Likes board games')
+        self.other = Gamer.objects.create(uid='gamer-2', bio='Likes card games')
+        self.game_type = GameType.objects.create(label='Board game')
+        self.client = APIClient(HTTP_AUTHORIZATION=self.gamer.uid)
+
+    def create_game(self, gamer=None, **kwargs):
+        """Creates a game owned by gamer (defaults to self.gamer)"""
+        fields = {
+            'game_type': self.game_type,
+            'gamer': gamer or self.gamer,
+            'title': 'Zelda',
+            'maker': 'Nintendo',
+            'number_of_players': 4,
+            'skill_level': 2,
+        }
+        fields.update(kwargs)
+        return Game.objects.create(**fields)
+
+    def create_event(self, game=None, organizer=None, **kwargs):
+        """Creates an event for game organized by organizer"""
+        fields = {
+            'game': game or self.create_game(),
+            'organizer': organizer or self.gamer,
+            'description': 'Game night',
+            'date': datetime.date(2023, 5, 27),
+            'time': datetime.time(17, 30),
+        }
+        fields.update(kwargs)
+        return Event.objects.create(**fields)
+
+    def seed_events(self, count):
+        """Creates count events, each with its own game and an attendee"""
+        for i in range(count):
+            owner = self.gamer if i % 2 else self.other
+            event = self.create_event(game=self.create_game(gamer=owner), organizer=owner)
+            EventGamer.objects.create(gamer=self.other, event=event)
+
+    def count_queries(self, url):
+        """Returns the number of queries a GET to url runs once the gamer cache is warm"""
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+
+class EventViewTests(LevelupTestCase):
+
+    def test_list_query_count_is_constant(self):
+        self.seed_events(2)
+        small = self.count_queries('/events')
+        self.seed_events(20)
+        self.assertEqual(self.count_queries('/events'), small)
+
+    def test_retrieve_query_count(self):
+        event = self.create_event()
+        self.assertEqual(self.count_queries(f'/events/{event.id}'), 1)
+
+    def test_list_shape(self):
+        event = self.create_event()
+        EventGamer.objects.create(gamer=self.gamer, event=event)
+        response = self.client.get('/events')
+        self.assertEqual(response.json(), [{
+            'id': event.id,
+            'game': {
+                'id': event.game.id,
+                'title': 'Zelda',
+                'maker': 'Nintendo',
+                'number_of_players': 4,
+                'skill_level': 2,
+                'game_type': {'id': self.game_type.id, 'label': 'Board game'},
+                'gamer': {'id': self.gamer.id, 'uid': 'gamer-1', 'bio': 'Likes board games'},
+            },
+            'description': 'Game night',
+            'date': 'May 27, 2023',
+            'time': '05:30 PM',
+            'organizer': {'id': self.gamer.id, 'uid': 'gamer-1', 'bio': 'Likes board games'},
+            'joined': 1,
+            'attendees_count': 1,
+        }])
+
+
+class GameViewTests(LevelupTestCase):
+
+    def test_list_query_count_is_constant(self):
+        self.seed_events(2)
+        small = self.count_queries('/games')
+        self.seed_events(20)
+        self.assertEqual(self.count_queries('/games'), small)
+
+    def test_event_info(self):
+        event = self.create_event()
+        self.create_event(game=event.game, description='Rematch', time=datetime.time(20, 0))
+        response = self.client.get('/games')
+        self.assertEqual(response.json()[0]['event_info'], [
+            'Game night', '2023-05-27', '17:30:00',
+            'Rematch', '2023-05-27', '20:00:00',
+        ])
+        response = self.client.get(f'/games/{event.game.id}')
+        self.assertEqual(response.json()['event_info'], [
+            'Game night', '2023-05-27', '17:30:00',
+            'Rematch', '2023-05-27', '20:00:00',
+        ])
+
+
+class PaginationTests(LevelupTestCase):
+
+    def collect_pages(self, url):
+        """Follows the next links from url and returns every result and the number of pages"""
+        results, pages = [], 0
+        while url:
+            body = self.client.get(url).json()
+            results.extend(body['results'])
+            url = body['next']
+            pages += 1
+        return results, pages
+
+    def test_events_are_paged_in_date_time_id_order(self):
+        game = self.create_game()
+        for day, hour in [(3, 9), (1, 12), (1, 9), (2, 9), (1, 9)]:
+            self.create_event(game=game, date=datetime.date(2023, 5, day), time=datetime.time(hour))
+        EventGamer.objects.create(gamer=self.gamer, event=Event.objects.get(date__day=3))
+        results, pages = self.collect_pages('/events?page_size=2')
+        self.assertEqual(pages, 3)
+        expected = Event.objects.order_by('date', 'time', 'id').values_list('id', flat=True)
+        self.assertEqual([event['id'] for event in results], list(expected))
+        self.assertEqual([event['joined'] for event in results], [0, 0, 0, 0, 1])
+        self.assertEqual([event['attendees_count'] for event in results], [0, 0, 0, 0, 1])
+
+    def test_games_are_paged_by_id(self):
+        games = [self.create_game() for _ in range(5)]
+        self.create_event(game=games[4])
+        results, pages = self.collect_pages('/games?page_size=2')
+        self.assertEqual(pages, 3)
+        self.assertEqual([game['id'] for game in results], [game.id for game in games])
+        self.assertEqual(results[4]['event_count'], 1)
+        self.assertEqual(results[4]['user_event_count'], 1)
+
+    def test_unpaginated_request_returns_a_list(self):
+        self.create_event()
+        self.assertIsInstance(self.client.get('/events').json(), list)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/events?cursor=bogus').status_code, 404)
+
+
+class AuthenticationTests(LevelupTestCase):
+
+    def test_gamer_is_resolved_from_cache(self):
+        self.create_event()
+        self.client.get('/events')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/events')
+        self.assertFalse(any('levelupapi_gamer"."uid" =' in query['sql'] for query in queries))
+
+    def test_register_after_failed_checkuser(self):
+        response = self.client.post('/checkuser', {'uid': 'new-uid'}, format='json')
+        self.assertEqual(response.json(), {'valid': False})
+        self.client.post('/register', {'uid': 'new-uid', 'bio': 'New'}, format='json')
+        response = self.client.post('/checkuser', {'uid': 'new-uid'}, format='json')
+        self.assertEqual(response.json()['bio'], 'New')
+
+    def test_saving_a_gamer_invalidates_the_cache(self):
+        self.client.get('/games')
+        self.gamer.bio = 'Changed'
+        self.gamer.save()
+        response = self.client.post('/checkuser', {'uid': self.gamer.uid}, format='json')
+        self.assertEqual(response.json()['bio'], 'Changed')
+
+    def test_unknown_uid_is_rejected(self):
+        client = APIClient(HTTP_AUTHORIZATION='nobody')
+        self.assertEqual(client.get('/events').status_code, 403)
+        self.assertEqual(client.get('/gametypes').status_code, 200)
+
+    def test_lru_cache_evicts_and_expires(self):
+        now = [0]
+        cache = LRUCache(maxsize=2, ttl=10, timer=lambda: now[0])
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        now[0] = 10
+        self.assertIsNone(cache.get('a'))
+
+
+class GameTypeViewTests(LevelupTestCase):
+
+    def test_list_is_cached_until_a_game_type_changes(self):
+        response = self.client.get('/gametypes')
+        self.assertEqual(response.json(), [{'id': self.game_type.id, 'label': 'Board game'}])
+        self.assertEqual(self.count_queries('/gametypes'), 0)
+        GameType.objects.create(label='Card game')
+        self.assertEqual(len(self.client.get('/gametypes').json()), 2)
+
+    def test_if_none_match(self):
+        url = f'/gametypes/{self.game_type.id}'
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.game_type.label = 'Party game'
+        self.game_type.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['label'], 'Party game')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_missing_game_type(self):
+        self.assertEqual(self.client.get('/gametypes/999').status_code, 404)
+
+
+class ConditionalGetTests(LevelupTestCase):
+
+    def assert_revalidates(self, url, write):
+        """Checks url answers 304 to its own ETag until write() runs"""
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 0)
+        write()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_events_list(self):
+        event = self.create_event()
+        self.assert_revalidates('/events', lambda: EventGamer.objects.create(gamer=self.gamer, event=event))
+
+    def test_games_list(self):
+        game = self.create_game()
+        self.assert_revalidates('/games', lambda: self.create_event(game=game))
+
+    def test_etag_is_per_gamer(self):
+        self.create_event()
+        etag = self.client.get('/events')['ETag']
+        other = APIClient(HTTP_AUTHORIZATION=self.other.uid)
+        self.assertEqual(other.get('/events', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_per_process_cache_warning(self):
+        def warnings(deploy=True):
+            return [message.id for message in run_checks(tags=['caches'], include_deployment_checks=deploy)]
+
+        self.assertIn('levelupapi.W001', warnings())
+        self.assertNotIn('levelupapi.W001', warnings(deploy=False))
+        with tempfile.TemporaryDirectory() as location:
+            file_cache = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}}
+            with override_settings(CACHES=file_cache):
+                self.assertNotIn('levelupapi.W001', warnings())
+
+
+class SignupTests(LevelupTestCase):
+
+    def test_signup_is_idempotent(self):
+        event = self.create_event()
+        first = self.client.post(f'/events/{event.id}/signup')
+        second = self.client.post(f'/events/{event.id}/signup')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(first.json()['id'], second.json()['id'])
+        self.assertEqual(self.client.get('/events').json()[0]['attendees_count'], 1)
+
+    def test_duplicate_membership_is_rejected(self):
+        event = self.create_event()
+        EventGamer.objects.create(gamer=self.gamer, event=event)
+        with self.assertRaises(IntegrityError):
+            EventGamer.objects.create(gamer=self.gamer, event=event)
+
+
+class CapacityTests(LevelupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.event = self.create_event(game=self.create_game(number_of_players=2))
+        self.gamers = [self.gamer, self.other] + [
+            Gamer.objects.create(uid=f'gamer-{i}', bio='Waiting') for i in range(3, 6)]
+
+    def signup(self, gamer):
+        return APIClient(HTTP_AUTHORIZATION=gamer.uid).post(f'/events/{self.event.id}/signup')
+
+    def leave(self, gamer):
+        return APIClient(HTTP_AUTHORIZATION=gamer.uid).delete(f'/events/{self.event.id}/leave')
+
+    def roster(self):
+        self.event.refresh_from_db()
+        return (
+            sorted(EventGamer.objects.filter(event=self.event).values_list('gamer__uid', flat=True)),
+            list(WaitlistEntry.objects.filter(event=self.event).order_by('id').values_list('gamer__uid', flat=True)),
+            self.event.attendees_count,
+        )
+
+    def test_full_events_waitlist_in_order(self):
+        responses = [self.signup(gamer) for gamer in self.gamers[:4]]
+        self.assertEqual([response.status_code for response in responses], [201, 201, 202, 202])
+        self.assertEqual([response.json().get('position') for response in responses], [None, None, 1, 2])
+        again = self.signup(self.gamers[3])
+        self.assertEqual((again.status_code, again.json()['position']), (200, 2))
+        self.assertEqual(self.roster(), (['gamer-1', 'gamer-2'], ['gamer-3', 'gamer-4'], 2))
+
+        self.leave(self.gamer)
+        self.assertEqual(self.roster(), (['gamer-2', 'gamer-3'], ['gamer-4'], 2))
+        self.leave(self.gamers[3])
+        self.assertEqual(self.roster(), (['gamer-2', 'gamer-3'], [], 2))
+        self.assertEqual(self.signup(self.gamers[4]).status_code, 202)
+
+    def test_bulk_signup_waitlists(self):
+        EventGamer.objects.create(gamer=self.gamers[3], event=self.event)
+        EventGamer.objects.create(gamer=self.gamers[4], event=self.event)
+        other_event = self.create_event()
+        response = self.client.post('/events/signup', {'events': [self.event.id, other_event.id]}, format='json')
+        self.assertEqual(response.json()['results'], [
+            {'event': self.event.id, 'status': 'waitlisted'},
+            {'event': other_event.id, 'status': 'added'},
+        ])
+        response = self.client.delete('/events/leave', {'events': [self.event.id, other_event.id]}, format='json')
+        self.assertEqual([result['status'] for result in response.json()['results']], ['left_waitlist', 'left'])
+
+    def test_more_players_promote(self):
+        for gamer in self.gamers:
+            self.signup(gamer)
+        self.client.patch(f'/games/{self.event.game_id}', {'numberOfPlayers': 4}, format='json')
+        self.assertEqual(self.roster(), (['gamer-1', 'gamer-2', 'gamer-3', 'gamer-4'], ['gamer-5'], 4))
+
+
+class BulkMembershipTests(LevelupTestCase):
+
+    def test_bulk_signup(self):
+        first, second = self.create_event(), self.create_event()
+        EventGamer.objects.create(gamer=self.gamer, event=first)
+        response = self.client.post('/events/signup', {'events': [first.id, second.id, 999, second.id]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['results'], [
+            {'event': first.id, 'status': 'already_joined'},
+            {'event': second.id, 'status': 'added'},
+            {'event': 999, 'status': 'not_found'},
+        ])
+        self.assertEqual(EventGamer.objects.filter(gamer=self.gamer).count(), 2)
+
+    def test_bulk_leave(self):
+        first, second = self.create_event(), self.create_event()
+        EventGamer.objects.create(gamer=self.gamer, event=first)
+        EventGamer.objects.create(gamer=self.other, event=first)
+        response = self.client.delete('/events/leave', {'events': [first.id, second.id, 999]}, format='json')
+        self.assertEqual(response.json()['results'], [
+            {'event': first.id, 'status': 'left'},
+            {'event': second.id, 'status': 'not_joined'},
+            {'event': 999, 'status': 'not_found'},
+        ])
+        self.assertEqual(list(EventGamer.objects.values_list('gamer_id', flat=True)), [self.other.id])
+
+    def test_bulk_signup_query_count_is_constant(self):
+        events = [self.create_event() for _ in range(20)]
+        self.client.get('/events')
+        with CaptureQueriesContext(connection) as small:
+            self.client.post('/events/signup', {'events': [events[0].id]}, format='json')
+        with CaptureQueriesContext(connection) as large:
+            self.client.post('/events/signup', {'events': [event.id for event in events[1:]]}, format='json')
+        self.assertEqual(len(small), len(large))
+
+    def test_bulk_leave_query_count_is_constant(self):
+        events = [self.create_event() for _ in range(21)]
+        self.client.post('/events/signup', {'events': [event.id for event in events]}, format='json')
+        with CaptureQueriesContext(connection) as small:
+            self.client.delete('/events/leave', {'events': [events[0].id]}, format='json')
+        with CaptureQueriesContext(connection) as large:
+            self.client.delete('/events/leave', {'events': [event.id for event in events[1:]]}, format='json')
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(set(Event.objects.values_list('attendees_count', flat=True)), {0})
+
+    def test_invalid_body(self):
+        response = self.client.post('/events/signup', {'events': ['x']}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class FlatSerializerTests(LevelupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.seed_events(3)
+        game = self.create_game(title='Catan', number_of_players=6)
+        self.create_event(game=game, date=datetime.date(2024, 12, 1), time=datetime.time(9, 5))
+        self.create_event(game=game, organizer=self.other, date=datetime.date(2023, 1, 9), time=datetime.time(0, 0))
+        EventGamer.objects.create(gamer=self.gamer, event=Event.objects.first())
+
+    def assertRendersLike(self, response, data):
+        self.assertEqual(response.content, JSONRenderer().render(data))
+
+    def test_events_match_event_serializer(self):
+        events = Event.objects.with_related().with_attendance(self.gamer)
+        self.assertRendersLike(self.client.get('/events'), EventSerializer(events, many=True).data)
+
+        ordered = list(events.order_by('date', 'time', 'id'))
+        response = self.client.get('/events?page_size=2')
+        self.assertRendersLike(response, {
+            'next': response.json()['next'],
+            'results': EventSerializer(ordered[:2], many=True).data,
+        })
+        response = self.client.get(response.json()['next'])
+        self.assertEqual(response.json()['results'], EventSerializer(ordered[2:4], many=True).data)
+
+    def test_games_match_game_serializer(self):
+        games = Game.objects.with_related().with_event_info().with_event_counts(self.gamer)
+        self.assertRendersLike(self.client.get('/games'), GameSerializer(games, many=True).data)
+        self.assertRendersLike(
+            self.client.get(f'/games?type={self.game_type.id}&page_size=100'),
+            {'next': None, 'results': GameSerializer(games.order_by('id'), many=True).data},
+        )
+
+
+class SparseFieldsetTests(LevelupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.event = self.create_event()
+        EventGamer.objects.create(gamer=self.gamer, event=self.event)
+
+    def test_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/events?fields=id,description,date,joined')
+        self.assertEqual(response.json(), [
+            {'id': self.event.id, 'description': 'Game night', 'date': 'May 27, 2023', 'joined': 1},
+        ])
+        sql = queries[-1]['sql']
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('levelupapi_game', sql)
+
+    def test_expand(self):
+        game = self.event.game
+        response = self.client.get('/events?fields=id,game,organizer&expand=game.gamer')
+        self.assertEqual(response.json(), [{
+            'id': self.event.id,
+            'game': {
+                'id': game.id, 'title': 'Zelda', 'maker': 'Nintendo', 'number_of_players': 4,
+                'skill_level': 2, 'game_type': self.game_type.id,
+                'gamer': {'id': self.gamer.id, 'uid': 'gamer-1', 'bio': 'Likes board games'},
+            },
+            'organizer': self.gamer.id,
+        }])
+
+    def test_games(self):
+        game = self.event.game
+        response = self.client.get('/games?fields=id,gamer,event_count&expand=&page_size=10')
+        self.assertEqual(response.json()['results'], [
+            {'id': game.id, 'gamer': self.gamer.id, 'event_count': 1},
+        ])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/games?fields=id,title')
+        self.assertEqual(len(queries), 1)
+
+    def test_unknown_names(self):
+        response = self.client.get('/events?fields=id,secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'fields': ['Unknown field: secret']})
+        response = self.client.get('/games?expand=title')
+        self.assertEqual(response.json(), {'expand': ['Unknown relation: title']})
+
+
+class EventFilterTests(LevelupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.game = self.create_game()
+        other_type = GameType.objects.create(label='Card game')
+        self.other_game = self.create_game(gamer=self.other, game_type=other_type)
+        self.past = self.create_event(game=self.game, date=datetime.date(2020, 1, 1))
+        self.soon = self.create_event(
+            game=self.other_game, organizer=self.other, date=datetime.date(2099, 1, 1), time=datetime.time(9))
+        self.later = self.create_event(game=self.game, date=datetime.date(2099, 1, 1), time=datetime.time(20))
+        EventGamer.objects.create(gamer=self.gamer, event=self.soon)
+
+    def ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [event['id'] for event in response.json()]
+
+    def test_filters(self):
+        cases = {
+            '/events?date_after=2021-01-01': [self.soon.id, self.later.id],
+            '/events?date_before=2021-01-01': [self.past.id],
+            f'/events?game={self.game.id}': [self.past.id, self.later.id],
+            f'/events?game_type={self.other_game.game_type_id}': [self.soon.id],
+            f'/events?organizer={self.other.id}': [self.soon.id],
+            '/events?joined=true': [self.soon.id],
+            '/events?joined=false': [self.past.id, self.later.id],
+            '/events?upcoming=true': [self.soon.id, self.later.id],
+            f'/events?upcoming=true&game={self.game.id}&ordering=-date': [self.later.id],
+        }
+        for url, expected in cases.items():
+            with self.subTest(url=url):
+                self.assertEqual(sorted(self.ids(url)), sorted(expected))
+
+    def test_ordering(self):
+        newest_first = [self.later.id, self.soon.id, self.past.id]
+        self.assertEqual(self.ids('/events?ordering=-date'), newest_first)
+        self.assertEqual(self.ids('/events?ordering=date'), newest_first[::-1])
+
+        response = self.client.get('/events?ordering=-date&page_size=2').json()
+        self.assertEqual([event['id'] for event in response['results']], newest_first[:2])
+        response = self.client.get(response['next']).json()
+        self.assertEqual([event['id'] for event in response['results']], newest_first[2:])
+        self.assertIsNone(response['next'])
+
+    def test_invalid_filters(self):
+        response = self.client.get('/events?date_after=yesterday&ordering=title')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'date_after', 'ordering'})
+
+
+@override_settings(LEVELUP_EXPORT_CHUNK_SIZE=2)
+class ExportTests(LevelupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.seed_events(5)
+        self.create_event(game=Game.objects.first(), description='Rematch \u2028')
+
+    def export(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, list(response.streaming_content)
+
+    def test_json_matches_the_list(self):
+        for url in ['/events', '/games', '/events?fields=id,game&expand=&upcoming=false', '/games?type=999']:
+            with self.subTest(url=url):
+                response, chunks = self.export(f'{url}{"&" if "?" in url else "?"}export=json')
+                self.assertEqual(response['Content-Type'], 'application/json')
+                self.assertEqual(b''.join(chunks), self.client.get(url).content)
+
+    def test_ndjson(self):
+        response, chunks = self.export('/events?export=ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(len(chunks), 4)
+        lines = b''.join(chunks).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], self.client.get('/events').json())
+
+    def test_unknown_format(self):
+        response = self.client.get('/events?export=xml')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(LEVELUP_METRICS_SAMPLE_RATE=1.0)
+class QueryTimingMiddlewareTests(LevelupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        metrics.clear()
+
+    def test_server_timing(self):
+        self.create_event()
+        response = self.client.get('/events')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", render;dur=')
+        self.assertNotIn('dup;', response['Server-Timing'])
+
+    def test_metrics(self):
+        self.client.get('/events')
+        self.client.get('/events')
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('levelup_requests_total{view="event-list"} 2', body)
+        self.assertIn('# TYPE levelup_db_queries_total counter', body)
+
+    @override_settings(LEVELUP_METRICS_DUPLICATE_THRESHOLD=1)
+    def test_repeated_queries_are_flagged(self):
+        with self.assertLogs('levelupapi.metrics', 'WARNING') as logs:
+            response = self.client.get(f'/games/{self.create_game().id}')
+        self.assertIn('dup;desc=', response['Server-Timing'])
+        self.assertIn('likely N+1', logs.output[0])
+
+    @override_settings(LEVELUP_METRICS_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_pass_through(self):
+        response = self.client.get('/events')
+        self.assertNotIn('Server-Timing', response)
+        self.assertNotIn('event-list', metrics.render())
+
+
+class StoredCounterTests(LevelupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.game = self.create_game()
+        self.event = self.create_event(game=self.game)
+
+    def assertCounts(self, attendees, events, event=None, game=None):
+        (event or self.event).refresh_from_db()
+        (game or self.game).refresh_from_db()
+        self.assertEqual((event or self.event).attendees_count, attendees)
+        self.assertEqual((game or self.game).event_count, events)
+
+    def test_signup_and_leave(self):
+        self.client.post(f'/events/{self.event.id}/signup')
+        self.client.post(f'/events/{self.event.id}/signup')
+        EventGamer.objects.create(gamer=self.other, event=self.event)
+        self.assertCounts(2, 1)
+        self.client.delete(f'/events/{self.event.id}/leave')
+        self.assertCounts(1, 1)
+
+    def test_bulk_signup_and_leave(self):
+        second = self.create_event(game=self.game)
+        self.client.post('/events/signup', {'events': [self.event.id, second.id]}, format='json')
+        self.assertCounts(1, 2)
+        self.assertCounts(1, 2, event=second)
+        self.client.delete('/events/leave', {'events': [self.event.id, second.id]}, format='json')
+        self.assertCounts(0, 2, event=second)
+
+    def test_events(self):
+        other_game = self.create_game(title='Catan')
+        self.client.post('/events', {
+            'game': self.game.id, 'description': 'Again', 'date': '2023-06-01', 'time': '18:00',
+            'organizer': self.gamer.id,
+        }, format='json')
+        self.assertCounts(0, 2)
+        self.client.put(f'/events/{self.event.id}', {
+            'game': other_game.id, 'description': 'Moved', 'date': '2023-06-01', 'time': '18:00',
+            'userId': self.gamer.uid,
+        }, format='json')
+        self.assertCounts(0, 1)
+        self.assertCounts(0, 1, game=other_game)
+        self.client.delete(f'/events/{self.event.id}')
+        other_game.refresh_from_db()
+        self.assertEqual(other_game.event_count, 0)
+
+    def test_cascades(self):
+        EventGamer.objects.create(gamer=self.other, event=self.event)
+        EventGamer.objects.create(gamer=self.gamer, event=self.event)
+        self.other.delete()
+        self.assertCounts(1, 1)
+        self.create_event(game=self.game, organizer=self.gamer)
+        EventGamer.objects.create(gamer=self.gamer, event=Event.objects.last())
+        with CaptureQueriesContext(connection) as queries:
+            self.game.delete()
+        self.assertFalse([query for query in queries if 'UPDATE' in query['sql']])
+
+    def test_repair_counters(self):
+        Event.objects.update(attendees_count=7)
+        Game.objects.update(event_count=0)
+        output = io.StringIO()
+        call_command('repair_counters', '--dry-run', stdout=output)
+        self.assertIn('1 event attendee counts and 1 game event counts are wrong', output.getvalue())
+        call_command('repair_counters', stdout=output)
+        self.assertCounts(0, 1)
+        self.assertEqual(self.client.get('/events').json()[0]['attendees_count'], 0)
+
+
+class DeleteTests(LevelupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.game = self.create_game()
+        self.event = self.create_event(game=self.game, organizer=self.other)
+        EventGamer.objects.create(gamer=self.gamer, event=self.event)
+        WaitlistEntry.objects.create(gamer=self.other, event=self.event)
+
+    def delete_game(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(f'/games/{self.game.id}')
+        self.assertEqual(response.status_code, 204)
+        return len(queries)
+
+    def test_game_delete_is_set_based(self):
+        self.create_game(title='Catan')
+        self.client.get('/dashboard')  # warms the gamer cache
+        small = self.delete_game()
+        self.game = self.create_game()
+        for _ in range(5):
+            event = self.create_event(game=self.game)
+            EventGamer.objects.create(gamer=self.gamer, event=event)
+            EventGamer.objects.create(gamer=self.other, event=event)
+        self.assertEqual(self.delete_game(), small)
+        self.assertEqual(
+            (Game.all_objects.count(), Event.all_objects.count(), EventGamer.objects.count(),
+             WaitlistEntry.objects.count()), (1, 0, 0, 0))
+        self.assertEqual(self.client.delete(f'/games/{self.game.id}').status_code, 404)
+
+    def test_event_delete_keeps_counters_search_and_dashboards(self):
+        second = self.create_event(game=self.game, description='Rematch')
+        organizer = APIClient(HTTP_AUTHORIZATION=self.other.uid)
+        self.assertEqual(len(organizer.get('/dashboard').json()['organized_events']), 1)
+        self.assertEqual(self.client.delete(f'/events/{self.event.id}').status_code, 204)
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.event_count, 1)
+        self.assertEqual(list(Event.all_objects.values_list('id', flat=True)), [second.id])
+        self.assertEqual((EventGamer.objects.count(), WaitlistEntry.objects.count()), (0, 0))
+        self.assertEqual(organizer.get('/dashboard').json()['organized_events'], [])
+        self.assertEqual(self.client.get('/search', {'q': 'game'}).json()['events'], [])
+        self.assertEqual(self.client.delete(f'/events/{self.event.id}').status_code, 404)
+
+    @override_settings(LEVELUP_SOFT_DELETE_THRESHOLD=2)
+    def test_soft_delete_and_purge(self):
+        small = self.create_event(game=self.create_game(title='Catan'))
+        self.assertEqual(self.client.delete(f'/events/{small.id}').status_code, 204)
+        self.assertFalse(Event.all_objects.filter(pk=small.pk).exists())
+
+        etag = self.client.get('/games')['ETag']
+        self.assertEqual(self.client.delete(f'/games/{self.game.id}').status_code, 204)
+        self.assertEqual(Event.all_objects.get(pk=self.event.pk).deleted_at, Game.all_objects.get(pk=self.game.pk).deleted_at)
+        self.assertEqual(EventGamer.objects.count(), 1)
+        self.assertNotEqual(self.client.get('/games')['ETag'], etag)
+        self.assertEqual([game['title'] for game in self.client.get('/games').json()], ['Catan'])
+        self.assertEqual(self.client.get('/events').json(), [])
+        self.assertEqual(self.client.get(f'/events/{self.event.id}').status_code, 404)
+        self.assertEqual(self.client.post(f'/events/{self.event.id}/signup').status_code, 404)
+        self.assertEqual(self.client.get('/search', {'q': 'zelda'}).json(), {'games': [], 'events': []})
+        self.assertEqual(self.client.delete(f'/games/{self.game.id}').status_code, 404)
+
+        output = io.StringIO()
+        call_command('purge_deleted', '--older-than', '3600', stdout=output)
+        self.assertIn('Purged 0 games and 0 events', output.getvalue())
+        call_command('purge_deleted', '--batch-size', '1', stdout=output)
+        self.assertIn('Purged 1 games and 0 events', output.getvalue())
+        self.assertEqual(
+            (Game.all_objects.count(), Event.all_objects.count(), EventGamer.objects.count(),
+             WaitlistEntry.objects.count()), (1, 0, 0, 0))
+
+
+class FixtureCounterTests(TestCase):
+    fixtures = ['gamers', 'game_types', 'games', 'events']
+
+    def test_loaddata_fills_the_counters(self):
+        client = APIClient(HTTP_AUTHORIZATION='1')
+        games = client.get('/games').json()
+        self.assertEqual([game['event_count'] for game in games], [1, 1, 1, 0])
+        self.assertTrue(all(bool(game['event_info']) == bool(game['event_count']) for game in games))
+        self.assertEqual(client.get('/games?type=1').json()[0]['event_count'], 1)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as fixture:
+            json.dump([{'model': 'levelupapi.eventgamer', 'pk': 1, 'fields': {'event': 1, 'gamer': 1}}], fixture)
+        try:
+            call_command('loaddata', fixture.name, verbosity=0)
+            call_command('loaddata', fixture.name, verbosity=0)
+        finally:
+            os.unlink(fixture.name)
+        self.assertEqual(Event.objects.get(pk=1).attendees_count, 1)
+        call_command('loaddata', 'games', verbosity=0)
+        self.assertEqual(Game.objects.get(pk=1).event_count, 1)
+
+
+class EditTests(LevelupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.event = self.create_event()
+
+    def test_patch_writes_only_the_fields_sent(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(f'/events/{self.event.id}', {'description': 'Moved'}, format='json')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response['ETag'], '"2"')
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"date"', updates[0])
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.description, self.event.version), ('Moved', 2))
+        self.assertEqual(self.event.date, datetime.date(2023, 5, 27))
+
+    def test_put_checks_references(self):
+        response = self.client.put(f'/events/{self.event.id}', {
+            'game': 0, 'description': 'Moved', 'date': '2023-06-01', 'time': '18:00', 'userId': 'nobody',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'game', 'userId'})
+        self.assertEqual(self.client.patch('/events/0', {}, format='json').status_code, 404)
+
+    def test_if_match(self):
+        etag = self.client.get(f'/events/{self.event.id}')['ETag']
+        first = self.client.patch(f'/events/{self.event.id}', {'description': 'First'},
+                                  format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(first.status_code, 204)
+        second = self.client.patch(f'/events/{self.event.id}', {'description': 'Second'},
+                                   format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(second.status_code, 412)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.description, 'First')
+        retry = self.client.patch(f'/events/{self.event.id}', {'description': 'Second'},
+                                  format='json', HTTP_IF_MATCH=first['ETag'])
+        self.assertEqual(retry.status_code, 204)
+
+    def test_game(self):
+        game = self.event.game
+        other_type = GameType.objects.create(label='Card game')
+        response = self.client.patch(f'/games/{game.id}', {'gameType': other_type.id, 'numberOfPlayers': 6},
+                                     format='json', HTTP_IF_MATCH='"1"')
+        self.assertEqual(response.status_code, 204)
+        game.refresh_from_db()
+        self.assertEqual((game.game_type_id, game.number_of_players, game.title), (other_type.id, 6, 'Zelda'))
+        self.assertEqual(self.client.get('/events').json()[0]['game']['game_type']['label'], 'Card game')
+        stale = self.client.put(f'/games/{game.id}', {
+            'title': 'Catan', 'maker': 'Kosmos', 'numberOfPlayers': 4, 'skillLevel': 1, 'gameType': other_type.id,
+        }, format='json', HTTP_IF_MATCH='"1"')
+        self.assertEqual(stale.status_code, 412)
+
+
+class DashboardTests(LevelupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.organized = self.create_event()
+        self.joined = self.create_event(game=self.create_game(gamer=self.other), organizer=self.other)
+        EventGamer.objects.create(gamer=self.gamer, event=self.joined)
+
+    def test_dashboard(self):
+        body = self.client.get('/dashboard').json()
+        self.assertEqual([event['id'] for event in body['joined_events']], [self.joined.id])
+        self.assertEqual([event['id'] for event in body['organized_events']], [self.organized.id])
+        self.assertEqual(body['joined_events'][0]['game']['title'], 'Zelda')
+        self.assertEqual(body['joined_events'][0]['attendees_count'], 1)
+        self.assertEqual([game['id'] for game in body['games']], [self.organized.game_id])
+        self.assertEqual(self.count_queries('/dashboard'), 0)
+
+    def test_invalidated_by_the_gamers_writes_only(self):
+        etag = self.client.get('/dashboard')['ETag']
+        APIClient(HTTP_AUTHORIZATION=self.other.uid).post(f'/events/{self.organized.id}/signup')
+        self.assertEqual(self.client.get('/dashboard', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.client.delete(f'/events/{self.joined.id}/leave')
+        response = self.client.get('/dashboard', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['joined_events'], [])
+        self.assertEqual(response.json()['organized_events'][0]['attendees_count'], 1)
+
+
+class SearchTests(LevelupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.zelda = self.create_game()
+        self.catan = self.create_game(title='Catan', maker='Kosmos')
+        self.zelda_night = self.create_event(game=self.zelda, description='Zelda speedrun night')
+        self.create_game(title='Mario Kart', maker='Nintendo Zelda team')
+
+    def search(self, query):
+        response = self.client.get('/search', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return {kind: [item.get('title', item.get('description')) for item in items]
+                for kind, items in response.json().items()}
+
+    def test_prefix_and_ranking(self):
+        self.assertEqual(self.search('ze'), {
+            'games': ['Zelda', 'Mario Kart'], 'events': ['Zelda speedrun night']})
+        self.assertEqual(self.search('zelda NIGH'), {'games': [], 'events': ['Zelda speedrun night']})
+        self.assertEqual(self.search('"kos OR *'), {'games': [], 'events': []})
+        response = self.client.get('/search', {'q': 'kos', 'type': 'games'})
+        self.assertEqual(response.json(), {'games': [{
+            'id': self.catan.id, 'title': 'Catan', 'maker': 'Kosmos',
+            'game_type': {'id': self.game_type.id, 'label': 'Board game'}, 'number_of_players': 4, 'skill_level': 2,
+        }]})
+        self.assertEqual(self.client.get('/search', {'q': 'z'}).status_code, 400)
+        self.assertEqual(self.client.get('/search', {'q': 'ze', 'type': 'players'}).status_code, 400)
+
+    def test_index_follows_writes(self):
+        self.client.patch(f'/games/{self.catan.id}', {'title': 'Carcassonne'}, format='json')
+        self.assertEqual(self.search('carc')['games'], ['Carcassonne'])
+        self.assertEqual(self.search('catan')['games'], [])
+        self.zelda.delete()
+        self.assertEqual(self.search('zelda'), {'games': ['Mario Kart'], 'events': []})
+        Game.objects.update(title='Renamed')
+        call_command('rebuild_search_index', 'games', stdout=io.StringIO())
+        self.assertEqual(len(self.search('renamed')['games']), 2)
+
+    @override_settings(LEVELUP_SEARCH_BACKEND='levelupapi.search.DatabaseBackend')
+    def test_database_backend(self):
+        self.assertEqual(self.search('zel'), {'games': ['Zelda', 'Mario Kart'], 'events': ['Zelda speedrun night']})
+
+
+class CatalogCommandTests(LevelupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.seed_events(3)
+        EventGamer.objects.create(gamer=self.gamer, event=Event.objects.first())
+
+    def snapshot(self):
+        return [
+            list(GameType.objects.order_by('id').values()),
+            list(Game.objects.order_by('id').values()),
+            list(Event.objects.order_by('id').values()),
+            list(EventGamer.objects.order_by('event', 'gamer').values('event', 'gamer')),
+        ]
+
+    def test_round_trip(self):
+        for fmt in ('csv', 'ndjson'):
+            with self.subTest(fmt=fmt):
+                before = self.snapshot()
+                files = {}
+                for kind in ('game_types', 'games', 'events', 'memberships'):
+                    files[kind] = io.StringIO()
+                    call_command('export_catalog', kind, format=fmt, stdout=files[kind], stderr=io.StringIO())
+                GameType.objects.all().delete()
+                for kind, exported in files.items():
+                    with tempfile.NamedTemporaryFile('w', suffix=f'.{fmt}', delete=False) as catalog_file:
+                        catalog_file.write(exported.getvalue())
+                    output = io.StringIO()
+                    call_command('import_catalog', kind, catalog_file.name, stdout=output)
+                    os.unlink(catalog_file.name)
+                    self.assertRegex(output.getvalue(), rf'Imported \d+ {kind} in .* rows/s')
+                self.assertEqual(self.snapshot(), before)
+
+    def test_round_trip_leaves_out_soft_deleted_events(self):
+        deleted = Event.objects.first()
+        deletion.delete_events([deleted.id], soft=True)
+        files = {}
+        for kind in ('game_types', 'games', 'events', 'memberships'):
+            files[kind] = io.StringIO()
+            call_command('export_catalog', kind, format='ndjson', stdout=files[kind], stderr=io.StringIO())
+        GameType.objects.all().delete()
+        for kind, exported in files.items():
+            with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as catalog_file:
+                catalog_file.write(exported.getvalue())
+            try:
+                call_command('import_catalog', kind, catalog_file.name, stdout=io.StringIO())
+            finally:
+                os.unlink(catalog_file.name)
+        self.assertEqual(Event.all_objects.count(), 2)
+        self.assertFalse(Event.all_objects.filter(pk=deleted.id).exists())
+        self.assertEqual(EventGamer.objects.count(), 2)
+
+    def import_ndjson(self, kind, *rows):
+        """Imports rows as an ndjson file of kind, two rows per batch; returns the command's output"""
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as catalog_file:
+            catalog_file.write(''.join(json.dumps(row) + '\n' for row in rows))
+        output = io.StringIO()
+        try:
+            call_command('import_catalog', kind, catalog_file.name, batch_size=2, stdout=output)
+        finally:
+            os.unlink(catalog_file.name)
+        return output.getvalue()
+
+    def test_natural_keys(self):
+        self.import_ndjson('game_types', {'label': 'Board game'}, {'label': 'Dice game'})
+        self.assertEqual(GameType.objects.count(), 2)
+        self.import_ndjson('games', *[
+            {'title': f'Game {i}', 'maker': 'Maker', 'number_of_players': 2, 'skill_level': 1,
+             'game_type': 'Dice game', 'gamer': 'gamer-2'}
+            for i in range(5)
+        ])
+        game = Game.objects.get(title='Game 4')
+        self.assertEqual((game.game_type.label, game.gamer_id), ('Dice game', self.other.id))
+        self.import_ndjson('events', {
+            'game': game.id, 'organizer': 'gamer-1', 'description': 'Dice night',
+            'date': '2024-02-01', 'time': '19:30'})
+        game.refresh_from_db()
+        self.assertEqual(game.event_count, 1)
+
+    def test_bad_row_aborts_the_file(self):
+        with self.assertRaisesMessage(CommandError, "line 2: unknown gamer 'nobody'"):
+            self.import_ndjson('memberships', {'event': Event.objects.first().id, 'gamer': 'gamer-2'},
+                               {'event': Event.objects.first().id, 'gamer': 'nobody'})
+        self.assertEqual(EventGamer.objects.count(), 4)
+
+    def test_reports_the_rows_inserted(self):
+        event = Event.objects.first()
+        output = self.import_ndjson('memberships', {'event': event.id, 'gamer': 'gamer-1'},
+                                    {'event': event.id, 'gamer': 'gamer-2'}, {'event': event.id, 'gamer': 'gamer-1'})
+        self.assertIn('Imported 0 memberships, skipped 3 already present', output)
+
+    def test_rejected_batch_names_its_lines(self):
+        game = Game.objects.first()
+        rows = [{'id': game.id + 100 + i, 'title': 'New', 'maker': 'Maker', 'number_of_players': 2,
+                 'skill_level': 1, 'game_type': 'Board game', 'gamer': 'gamer-1'} for i in range(2)]
+        rows.insert(1, {**rows[0], 'id': game.id})
+        with self.assertRaisesMessage(CommandError, 'lines 1-2: rejected by the database'):
+            self.import_ndjson('games', *rows)
+        self.assertFalse(Game.objects.filter(title='New').exists())
+
+
+class ExplainQueriesTests(TestCase):
+
+    def test_view_queries_use_indexes(self):
+        call_command('explain_queries', stdout=io.StringIO())
+
+
+@override_settings(ROOT_URLCONF='levelup.asgi_urls')
+class AsyncViewTests(LevelupTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.async_client = AsyncClient()
+        event = self.create_event()
+        self.create_event(game=event.game, date=datetime.date(2023, 6, 1))
+        EventGamer.objects.create(gamer=self.gamer, event=event)
+        self.event = event
+
+    async def assert_same_as_sync(self, url):
+        """Checks the async view at url answers exactly like the DRF view"""
+        expected = await self.client_get(url)
+        response = await self.async_client.get(url, headers=self.headers())
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(response.get('ETag'), expected.get('ETag'))
+        return response
+
+    def headers(self, **headers):
+        """Returns the request headers of self.gamer"""
+        return {'Authorization': self.gamer.uid, **headers}
+
+    async def client_get(self, url):
+        with override_settings(ROOT_URLCONF='levelup.urls'):
+            return await sync_to_async(self.client.get)(url)
+
+    async def test_reads_match_the_sync_views(self):
+        for url in ['/events', f'/events/{self.event.id}', '/events?page_size=1',
+                    '/games', f'/games/{self.event.game.id}', f'/games?type={self.game_type.id}',
+                    '/events?fields=id,game&expand=game.game_type', '/games?expand=&fields=id,event_info',
+                    '/events?fields=nope', '/events?upcoming=false&joined=true&ordering=-date&page_size=1',
+                    '/events?game_type=x', '/events/999', '/games/999',
+                    '/events?cursor=garbage', '/games?cursor=garbage']:
+            with self.subTest(url=url):
+                await self.assert_same_as_sync(url)
+
+    async def test_server_timing_counts_the_queries(self):
+        for url in [f'/events/{self.event.id}', '/games?page_size=1']:
+            with self.subTest(url=url):
+                await self.client_get(url)  # warms the gamer cache
+                expected = await self.client_get(url)
+                response = await self.async_client.get(url, headers=self.headers())
+                queries = re.search(r'desc="(\d+) queries"', response['Server-Timing']).group(1)
+                self.assertNotEqual(queries, '0')
+                self.assertIn(f'desc="{queries} queries"', expected['Server-Timing'])
+
+    @override_settings(LEVELUP_EXPORT_CHUNK_SIZE=1)
+    async def test_export(self):
+        for url in ['/events?export=json', '/games?export=ndjson']:
+            with self.subTest(url=url):
+                expected = await self.client_get(url)
+                response = await self.async_client.get(url, headers=self.headers())
+                self.assertEqual(
+                    b''.join([chunk async for chunk in response.streaming_content]),
+                    await sync_to_async(b''.join)(expected.streaming_content),
+                )
+
+    async def test_if_none_match(self):
+        etag = (await self.async_client.get('/events', headers=self.headers()))['ETag']
+        response = await self.async_client.get('/events', headers=self.headers(**{'If-None-Match': etag}))
+        self.assertEqual(response.status_code, 304)
+
+    async def test_check_user(self):
+        response = await self.async_client.post(
+            '/checkuser', {'uid': self.gamer.uid}, content_type='application/json', headers=self.headers())
+        self.assertEqual(response.json()['id'], self.gamer.id)
+
+    async def next_event(self, response):
+        return await asyncio.wait_for(anext(response.streaming_content), 5)
+
+    async def test_roster_stream(self):
+        response = await self.async_client.get(f'/events/stream?events={self.event.id}', headers=self.headers())
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(await self.next_event(response), b'retry: 3000\n\n')
+        self.assertEqual(len(roster.hub), 1)
+
+        def write(method, url, **kwargs):
+            with self.captureOnCommitCallbacks(execute=True):
+                getattr(self.client, method)(url, **kwargs)
+
+        await sync_to_async(write)('delete', f'/events/{self.event.id}/leave')
+        await sync_to_async(write)('patch', f'/events/{self.event.id}', data={'description': 'Moved'}, format='json')
+        self.assertEqual(await self.next_event(response), (
+            b'event: leave\ndata: {"type": "leave", "event": %d, "attendees_count": 0, "joined": false}\n\n'
+            % self.event.id))
+        self.assertEqual(await self.next_event(response), (
+            b'event: update\ndata: {"type": "update", "event": %d, "version": 2}\n\n' % self.event.id))
+
+        # a client going away cancels the task reading the stream
+        reading = asyncio.ensure_future(anext(response.streaming_content))
+        await asyncio.sleep(0)
+        reading.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await reading
+        self.assertEqual(len(roster.hub), 0)
+
+    async def test_roster_hub(self):
+        everything = roster.hub.subscribe(self.gamer.id)
+        following = roster.hub.subscribe(self.other.id, {self.event.id})
+        try:
+            with self.settings(LEVELUP_ROSTER_QUEUE_SIZE=2):
+                slow = roster.hub.subscribe(self.other.id)
+            # dispatched from another thread, like the publish of a sync view
+            for event_id in (self.event.id + 1, self.event.id, self.event.id):
+                await sync_to_async(roster.hub.dispatch, thread_sensitive=False)({'type': 'delete', 'event': event_id})
+            await asyncio.sleep(0)
+            self.assertEqual(everything.queue.qsize(), 3)
+            self.assertEqual(following.queue.qsize(), 2)
+            self.assertEqual(slow.queue.get_nowait(), roster.RESYNC)
+        finally:
+            for subscriber in (everything, following, slow):
+                roster.hub.unsubscribe(subscriber)
+
+    @override_settings(LEVELUP_ROSTER_POLL_INTERVAL=0.01)
+    async def test_cache_broker(self):
+        broker = roster.CacheBroker(roster.hub)
+        subscriber = roster.hub.subscribe(self.gamer.id)
+        try:
+            broker.start()
+            await asyncio.sleep(0.02)
+            # published by another worker, through the shared cache
+            await sync_to_async(roster.CacheBroker(roster.RosterHub()).publish)([{'type': 'delete', 'event': 1}])
+            self.assertEqual(await asyncio.wait_for(subscriber.queue.get(), 5), {'type': 'delete', 'event': 1})
+        finally:
+            roster.hub.unsubscribe(subscriber)
+            await asyncio.wait_for(broker.task, 5)
+
+    async def test_writes_go_to_the_sync_views(self):
+        response = await self.async_client.post(f'/events/{self.event.id}/signup', headers=self.headers())
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.delete(f'/events/{self.event.id}', headers=self.headers())
+        self.assertEqual(response.status_code, 204)
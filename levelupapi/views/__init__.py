@@ -2,3 +2,6 @@ from .game_type import GameTypeView
 from .event import EventView
 from .game import GameView
 from .auth import check_user, register_user
+from .metrics import metrics_view
+from .dashboard import dashboard_view
+from .search import search_view
@@ -0,0 +1,168 @@
+"""
+Async versions of the hot read endpoints, served instead of the DRF views under ASGI
+(see levelup/asgi_urls.py).
+
+They return the same bodies, status codes and ETags as EventView.list/retrieve,
+GameView.list/retrieve and check_user, but await the database through Django's async ORM
+instead of holding a worker thread per request, so one process can serve many polling clients.
+event_stream has no sync counterpart: it pushes roster changes to clients that would otherwise poll.
+"""
+import json
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from levelupapi import roster
+from levelupapi.authentication import aget_gamer
+from levelupapi.cache import aversion_etag, etag_matches
+from levelupapi.concurrency import row_etag
+from levelupapi.models import Event, Game
+from levelupapi.pagination import KeysetPagination
+from levelupapi.streaming import Export, export_format
+from levelupapi.views.event import EventFilterSerializer, EventSerializer, FlatEventSerializer
+from levelupapi.views.game import FlatGameSerializer, GameSerializer
+
+NOT_AUTHENTICATED = {'detail': 'Authentication credentials were not provided.'}
+
+
+def render(data, status_code=status.HTTP_200_OK):
+    """Renders data exactly like DRF's JSONRenderer does for the sync views"""
+    return HttpResponse(JSONRenderer().render(data), status=status_code, content_type='application/json')
+
+
+def render_error(ex):
+    """Renders an APIException like DRF's exception handler does (400 for bad parameters, 404 for a bad cursor)"""
+    data = ex.detail if isinstance(ex.detail, (list, dict)) else {'detail': ex.detail}
+    return render(data, ex.status_code)
+
+
+async def render_list(request, serializer, queryset, ordering, etag, fmt):
+    """Renders the rows of queryset paginated like the sync list views, or streams them for ?export="""
+    if fmt is not None:
+        response = Export(serializer, queryset, fmt).response(asynchronous=True)
+    else:
+        paginator = KeysetPagination(ordering=ordering)
+        try:
+            page = await paginator.apaginate_queryset(queryset, Request(request))
+        except APIException as ex:
+            return render_error(ex)
+        rows = page if page is not None else [row async for row in queryset]
+        await serializer.aload(rows)
+        data = serializer.serialize(rows)
+        if page is not None:
+            data = {'next': paginator.get_next_link(), 'results': data}
+        response = render(data)
+    response['ETag'] = etag
+    patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+async def event_list(request):
+    """Handle GET requests to get all events"""
+    gamer = await aget_gamer(request.META.get('HTTP_AUTHORIZATION'))
+    if gamer is None:
+        return render(NOT_AUTHENTICATED, status.HTTP_403_FORBIDDEN)
+
+    etag = await aversion_etag('events', 'list', gamer.id, timezone.localdate(), request.get_full_path())
+    if etag_matches(request, etag):
+        return HttpResponseNotModified(headers={'ETag': etag})
+
+    try:
+        serializer = FlatEventSerializer.from_query_params(request.GET)
+        filters = EventFilterSerializer(request.GET)
+        filters.is_valid(raise_exception=True)
+        fmt = export_format(request.GET)
+    except APIException as ex:
+        return render_error(ex)
+    events = filters.filter_queryset(Event.objects.with_attendance(gamer), gamer)
+    events = serializer.values(events, 'date', 'time', 'id')
+    return await render_list(request, serializer, events, filters.order_by, etag, fmt)
+
+
+async def event_retrieve(request, pk):
+    """Handle GET requests for single event"""
+    try:
+        event = await Event.objects.with_related().aget(pk=pk)
+    except Event.DoesNotExist as ex:
+        return render({'message': ex.args[0]}, status.HTTP_404_NOT_FOUND)
+    response = render(EventSerializer(event).data)
+    response['ETag'] = row_etag(event.version)
+    return response
+
+
+async def game_list(request):
+    """GET requests for all games"""
+    gamer = await aget_gamer(request.META.get('HTTP_AUTHORIZATION'))
+    if gamer is None:
+        return render(NOT_AUTHENTICATED, status.HTTP_403_FORBIDDEN)
+
+    etag = await aversion_etag('games', 'list', gamer.id, request.get_full_path())
+    if etag_matches(request, etag):
+        return HttpResponseNotModified(headers={'ETag': etag})
+
+    try:
+        serializer = FlatGameSerializer.from_query_params(request.GET)
+        fmt = export_format(request.GET)
+    except APIException as ex:
+        return render_error(ex)
+    games = serializer.values(Game.objects.with_event_counts(gamer), 'id')
+    game_type = request.GET.get('type', None)
+    if game_type is not None:
+        games = games.filter(game_type_id=game_type)
+    return await render_list(request, serializer, games, ('id',), etag, fmt)
+
+
+async def game_retrieve(request, pk):
+    """GET requests for single game"""
+    try:
+        # event_info can't fall back to a lazy query in async code, so prefetch it
+        game = await Game.objects.with_related().with_event_info().aget(pk=pk)
+    except Game.DoesNotExist as ex:
+        return render({'message': ex.args[0]}, status.HTTP_404_NOT_FOUND)
+    response = render(GameSerializer(game).data)
+    response['ETag'] = row_etag(game.version)
+    return response
+
+
+async def event_stream(request):
+    """
+    Streams the roster changes of the events (signups, leaves, edits and deletes) as Server-Sent
+    Events, so clients don't have to poll the event list. ?events=1,2 follows only those events.
+    EventSource can't send an Authorization header, so the uid may be passed as ?uid= instead.
+    """
+    gamer = await aget_gamer(request.META.get('HTTP_AUTHORIZATION') or request.GET.get('uid'))
+    if gamer is None:
+        return render(NOT_AUTHENTICATED, status.HTTP_403_FORBIDDEN)
+
+    event_ids = request.GET.get('events')
+    if event_ids is not None:
+        try:
+            event_ids = {int(event_id) for event_id in event_ids.split(',') if event_id}
+        except ValueError:
+            return render({'events': ['A comma separated list of event ids is required.']},
+                          status.HTTP_400_BAD_REQUEST)
+
+    response = StreamingHttpResponse(roster.stream(gamer.id, event_ids), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # keeps nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def check_user(request):
+    """Checks to see if User has Associated Gamer"""
+    try:
+        if request.content_type == 'application/json':
+            uid = json.loads(request.body)['uid']
+        else:
+            uid = request.POST['uid']
+    except (ValueError, KeyError, TypeError):
+        return render({'detail': 'A uid is required.'}, status.HTTP_400_BAD_REQUEST)
+
+    gamer = await aget_gamer(uid)
+    if gamer is not None:
+        return render({'id': gamer.id, 'uid': gamer.uid, 'bio': gamer.bio})
+    return render({'valid': False})
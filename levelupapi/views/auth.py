@@ -1,4 +1,5 @@
 from levelupapi.models import Gamer
+from levelupapi.authentication import get_gamer
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
@@ -14,7 +15,7 @@ def check_user(request):
 
     # Use the built-in authenticate method to verify
     # authenticate returns the user object or None if no user is found
-    gamer = Gamer.objects.filter(uid=uid).first()
+    gamer = get_gamer(uid)
 
     # If authentication was successful, respond with their token
     if gamer is not None:
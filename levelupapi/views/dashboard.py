@@ -0,0 +1,54 @@
+"""View module for the home screen of a gamer"""
+import uuid
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+from levelupapi.authentication import current_gamer
+from levelupapi.cache import cached_data, dashboard_namespace, not_modified, version_etag
+from levelupapi.models import Event
+from levelupapi.views.event import FlatEventSerializer
+from levelupapi.views.game import FlatGameSerializer
+
+EVENT_FIELDS = ['id', 'game', 'description', 'date', 'time', 'organizer', 'attendees_count']
+GAME_FIELDS = ['id', 'game_type', 'title', 'maker', 'number_of_players', 'skill_level', 'event_count']
+
+
+def build_dashboard(gamer):
+    """
+    Returns the events gamer joined, the events gamer organizes and the games gamer owns, each
+    read through an index on the gamer's column rather than by annotating every event and game
+    """
+    events = FlatEventSerializer(fields=EVENT_FIELDS, expand=['game'])
+    games = FlatGameSerializer(fields=GAME_FIELDS, expand=['game_type'])
+    ordering = ('date', 'time', 'id')
+    return {
+        'joined_events': events.serialize(events.values(Event.objects.joined_by(gamer).order_by(*ordering))),
+        'organized_events': events.serialize(events.values(Event.objects.filter(organizer=gamer).order_by(*ordering))),
+        'games': games.serialize(games.values(gamer.games.order_by('id'))),
+    }
+
+
+@api_view(['GET'])
+def dashboard_view(request):
+    '''Returns what the home screen of the gamer shows, instead of filtering the full lists client side
+
+    The body is cached per gamer and invalidated by the gamer's own writes (signups, leaves, and the
+    events and games they organize or own). The attendee and event counts, and edits by others to
+    the events the gamer joined, may lag by up to LEVELUP_DASHBOARD_TTL seconds.
+
+    Method arguments:
+      request -- The full HTTP request object
+    '''
+    gamer = current_gamer(request)
+    namespace = dashboard_namespace(gamer.id)
+    # each build gets its own stamp, so the ETag changes when an expired body is rebuilt
+    entry = cached_data(
+        namespace, 'body',
+        lambda: {'built': uuid.uuid4().hex, 'data': build_dashboard(gamer)},
+        timeout=getattr(settings, 'LEVELUP_DASHBOARD_TTL', 60),
+    )
+    etag = version_etag(namespace, entry['built'])
+    response = not_modified(request, etag) or Response(entry['data'], headers={'ETag': etag})
+    patch_vary_headers(response, ['Authorization'])
+    return response
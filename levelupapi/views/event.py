@@ -1,12 +1,21 @@
 """View module for handling requests about events"""
-from django.http import HttpResponseServerError
 from rest_framework.viewsets import ViewSet
 from rest_framework.response import Response
 from rest_framework import serializers, status
 from rest_framework.decorators import action
-from levelupapi.models import Event, Game, Gamer, EventGamer
-from django.db.models import Count, Q
-from django.core.exceptions import ValidationError
+from rest_framework.exceptions import NotFound
+from levelupapi.models import Event, Game, Gamer, EventGamer, WaitlistEntry
+from levelupapi.pagination import KeysetPagination
+from levelupapi.streaming import Export, export_format
+from levelupapi.authentication import current_gamer
+from levelupapi.cache import bump_dashboards, bump_version, not_modified, version_etag
+from levelupapi.concurrency import row_etag, update_row
+from levelupapi.signals import add_to_counter
+from levelupapi import deletion, roster, search, seating
+from levelupapi.flat import Field, FlatSerializer, Relation
+from django.utils.cache import patch_vary_headers
+from django.db import transaction
+from django.utils import timezone
 
 
 class EventView(ViewSet):
@@ -22,7 +31,7 @@ class EventView(ViewSet):
             Response: JSON instance of the created event
         """
         # Get the Gamer instance associated with the current user
-        organizer = Gamer.objects.get(uid=request.META['HTTP_AUTHORIZATION'])
+        organizer = current_gamer(request)
         
         # Initialize the CreateEventSerializer with the request data
         serializer = CreateEventSerializer(data=request.data)
@@ -30,8 +39,9 @@ class EventView(ViewSet):
         # Validate the serializer data and raise an exception if it's not valid
         serializer.is_valid(raise_exception=True)
         
-        # Save the event with the associated organizer
-        serializer.save(organizer=organizer)
+        # Save the event with the associated organizer, in the same transaction as its game's event_count
+        with transaction.atomic():
+            serializer.save(organizer=organizer)
         
         # Return the serialized event data as a JSON response with a 201 Created status
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -56,9 +66,10 @@ class EventView(ViewSet):
             Response -- JSON serialized game type
         """
         try:
-            event = Event.objects.get(pk=pk)
+            event = Event.objects.with_related().get(pk=pk)
             serializer = EventSerializer(event)
-            return Response(serializer.data)
+            # the version the client sends back in If-Match when editing the event
+            return Response(serializer.data, headers={'ETag': row_etag(event.version)})
         except Event.DoesNotExist as ex:
             return Response({'message': ex.args[0]}, status=status.HTTP_404_NOT_FOUND)
 
@@ -68,85 +79,308 @@ class EventView(ViewSet):
         Returns:
             Response -- JSON serialized list of events
         """
-        # retrieves the HTTP_AUTHORIZATION header from the request's metadata and assigns it to the variable uid
-        uid = request.META.get('HTTP_AUTHORIZATION')
-        # retrieves the Gamer object with the uid retrieved from the request
-        gamer = Gamer.objects.get(uid=uid)
-        # retrieves all Event objects and annotates them with two additional fields: attendees_count and joined
-        events = Event.objects.annotate(
-            # the count of all attendees for each event
-            attendees_count=Count('attendees'),
-            # the count of attendees that match the gamer retrieved from the request
-            joined=Count(
-                'attendees',
-                filter=Q(attendees__gamer=gamer)
-            )
-            # In this case, attendees is the field we are looking up, and gamer is the field we are filtering on. The double underscore notation is used to indicate that we are performing a lookup on the attendees field to filter the results based on the gamer field. This allows us to retrieve only the Event objects where the related attendee has a matching gamer.
-        )
+        # retrieves the Gamer resolved from the HTTP_AUTHORIZATION header by GamerAuthentication
+        gamer = current_gamer(request)
+        # answers with 304 before running any query when nothing changed since the client's last poll
+        # the date is part of the key because ?upcoming= moves on every day
+        etag = version_etag('events', 'list', gamer.id, timezone.localdate(), request.get_full_path())
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        # ?fields= and ?expand= pick the fields and embedded relations to render (all of them by default)
+        serializer = FlatEventSerializer.from_query_params(request.query_params)
+        # the date range, game, game_type, organizer, joined, upcoming and ordering parameters
+        filters = EventFilterSerializer(request.query_params)
+        filters.is_valid(raise_exception=True)
+        # retrieves all Event objects and annotates them with joined; attendees_count is stored on the event
+        # with_attendance() counts the attendees matching the gamer retrieved from the request
+        # serializer.values() fetches only the columns, joins and counts behind the selected fields as plain dicts
+        events = filters.filter_queryset(Event.objects.with_attendance(gamer), gamer)
+        events = serializer.values(events, 'date', 'time', 'id')
         # for event in events:
         #     # Check to see if there is a row in the Event Games table that has the passed in gamer and event
         #     event.joined = len(EventGamer.objects.filter(
         #     gamer=gamer, event=event)) > 0
-        serializer = EventSerializer(events, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+
+        # ?export=json or ?export=ndjson streams every matching event instead of building the whole body
+        fmt = export_format(request.query_params)
+        if fmt is not None:
+            response = Export(serializer, events, fmt).response()
+        else:
+            # keyset pagination over (date, time, id), in the ?ordering= direction, when the client asks for pages
+            paginator = KeysetPagination(ordering=filters.order_by)
+            page = paginator.paginate_queryset(events, request, view=self)
+            if page is not None:
+                response = paginator.get_paginated_response(serializer.serialize(page))
+            else:
+                response = Response(serializer.serialize(events), status=status.HTTP_200_OK)
+
+        # the body depends on who asks (joined), so shared caches must key on the Authorization header too
+        response['ETag'] = etag
+        patch_vary_headers(response, ['Authorization'])
+        return response
     
     def update(self, request, pk):
         """Update Event
-        Returns Empty Body with 204 status
+        Returns Empty Body with 204 status, and the new version of the event as its ETag
         """
-        event = Event.objects.get(pk=pk)
-        event.description = request.data["description"]
-        event.date = request.data["date"]
-        event.time = request.data["time"]
-        
-        game = Game.objects.get(pk=request.data["game"])
-        organizer = Gamer.objects.get(uid=request.data["userId"])
-        event.game = game
-        event.organizer = organizer
-        event.save()
-        
-        return Response(None, status=status.HTTP_204_NO_CONTENT)
+        serializer = UpdateEventSerializer(data=request.data, partial=request.method == 'PATCH')
+        serializer.is_valid(raise_exception=True)
+        changes = serializer.changes
+
+        # one UPDATE of the changed columns, refused (412) when If-Match names an older version
+        with transaction.atomic():
+            row = update_row(Event, pk, changes, request, read=('game_id', 'organizer_id'))
+            # a queryset update skips the signals: move the event between the games' event_count here
+            game_id = changes.get('game_id', row['game_id'])
+            if game_id != row['game_id']:
+                add_to_counter(Game.objects.filter(pk=row['game_id']), 'event_count', -1)
+                add_to_counter(Game.objects.filter(pk=game_id), 'event_count', 1)
+                # the new game may seat more players
+                seating.promote_waitlist([pk])
+            bump_version('events', 'games')
+            bump_dashboards(row['organizer_id'], changes.get('organizer_id'))
+            if 'description' in changes:
+                search.reindex(Event, [pk])
+            roster.publish({'type': 'update', 'event': int(pk), 'version': row['version'] + 1})
+
+        return Response(None, status=status.HTTP_204_NO_CONTENT, headers={'ETag': row_etag(row['version'] + 1)})
+
+    def partial_update(self, request, pk):
+        """PATCH Event: updates only the fields sent"""
+        return self.update(request, pk)
     
     @action(methods=['post'], detail=True)
     def signup(self, request, pk):
-        """Post request for a user to sign up for an event"""
+        """Post request for a user to sign up for an event
 
-        gamer = Gamer.objects.get(uid=request.META['HTTP_AUTHORIZATION'])
-        event = Event.objects.get(pk=pk)
-        EventGamer.objects.create(
-            gamer=gamer,
-            event=event
-        )
-        return Response({'message': 'Gamer added'}, status=status.HTTP_201_CREATED)
+        Takes a seat when the event has one free (201), puts the gamer on its waitlist when it's full (202).
+        Repeated signups are idempotent (200).
+        """
+
+        gamer = current_gamer(request)
+        # seating.join() locks the event row, so concurrent signups can't take the same last seat
+        outcome = seating.join(gamer.id, [int(pk)]).get(int(pk))
+        if outcome is None:
+            return Response({'message': 'Event not found.'}, status=status.HTTP_404_NOT_FOUND)
+        if outcome in (seating.WAITLISTED, seating.ALREADY_WAITLISTED):
+            position = seating.waitlist_position(pk, gamer.id)
+            if outcome == seating.ALREADY_WAITLISTED:
+                return Response({'message': 'Gamer already waitlisted', 'position': position}, status=status.HTTP_200_OK)
+            return Response({'message': 'Event is full, gamer waitlisted', 'position': position}, status=status.HTTP_202_ACCEPTED)
+        membership_id = EventGamer.objects.filter(gamer=gamer, event_id=pk).values_list('id', flat=True).get()
+        if outcome == seating.ALREADY_JOINED:
+            return Response({'message': 'Gamer already joined', 'id': membership_id}, status=status.HTTP_200_OK)
+        return Response({'message': 'Gamer added', 'id': membership_id}, status=status.HTTP_201_CREATED)
     
     def destroy(self, request, pk):
-        """DELETE Event"""
-        event = Event.objects.get(pk=pk)
-        event.delete()
+        """DELETE Event, with its memberships and waitlist, without loading them (see levelupapi.deletion)"""
+        if not deletion.delete_events([pk]):
+            raise NotFound('No event matches the given query.')
         return Response(None, status=status.HTTP_204_NO_CONTENT)
     
     @action(methods=['delete'], detail=True)
     def leave(self, request, pk):
-        """Leave an event"""
+        """Leave an event, or its waitlist. The seat freed goes to the first gamer on the waitlist."""
         
-        gamer = Gamer.objects.get(uid=request.META['HTTP_AUTHORIZATION'])
-        event = Event.objects.get(pk=pk)
-        event_gamer = EventGamer.objects.filter(gamer=gamer, event=event)
-        event_gamer.delete()
+        gamer = current_gamer(request)
+        with transaction.atomic():
+            left, _ = EventGamer.objects.filter(gamer=gamer, event_id=pk).delete()
+            WaitlistEntry.objects.filter(gamer=gamer, event_id=pk).delete()
+            if left:
+                seating.promote_waitlist([pk])
         return Response({'message': 'Gamer left'}, status=status.HTTP_204_NO_CONTENT)
-        
+
+    @action(methods=['post'], detail=False, url_path='signup')
+    def bulk_signup(self, request):
+        """Post request for a user to sign up for several events at once
+
+        Expects {"events": [event ids]} and reports what happened to each id:
+        "added", "waitlisted" (the event is full), "already_joined", "already_waitlisted" or "not_found".
+        """
+        gamer = current_gamer(request)
+        serializer = EventIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        event_ids = serializer.validated_data['events']
+
+        # a constant number of queries however many events are sent, see seating.join()
+        statuses = seating.join(gamer.id, event_ids)
+
+        results = [{'event': event_id, 'status': statuses.get(event_id, 'not_found')} for event_id in event_ids]
+        return Response(
+            {'results': results},
+            status=status.HTTP_201_CREATED if seating.JOINED in statuses.values() else status.HTTP_200_OK
+        )
+
+    @action(methods=['delete'], detail=False, url_path='leave')
+    def bulk_leave(self, request):
+        """Leave several events at once
+
+        Expects {"events": [event ids]} and reports what happened to each id:
+        "left", "left_waitlist", "not_joined" or "not_found".
+        """
+        gamer = current_gamer(request)
+        serializer = EventIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        event_ids = serializer.validated_data['events']
+
+        with transaction.atomic():
+            found = set(Event.objects.filter(pk__in=event_ids).values_list('id', flat=True))
+            memberships = EventGamer.objects.filter(gamer=gamer, event_id__in=found)
+            left = set(memberships.values_list('event_id', flat=True))
+            # one DELETE and one UPDATE however many events: a queryset delete() would send
+            # post_delete, and count the leave, once per membership
+            deletion.raw_delete(memberships)
+            if left:
+                add_to_counter(Event.objects.filter(pk__in=left), 'attendees_count', -1)
+                bump_version('events')
+                bump_dashboards(gamer.id)
+                roster.publish_attendance(left, gamer.id, joined=False)
+            entries = WaitlistEntry.objects.filter(gamer=gamer, event_id__in=found)
+            left_waitlist = set(entries.values_list('event_id', flat=True))
+            entries.delete()
+            seating.promote_waitlist(left)
+
+        results = [
+            {'event': event_id, 'status': 'left' if event_id in left else
+             'left_waitlist' if event_id in left_waitlist else
+             'not_joined' if event_id in found else 'not_found'}
+            for event_id in event_ids
+        ]
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+class EventIdsSerializer(serializers.Serializer):
+    """Validates the list of event ids sent to the bulk signup and leave actions"""
+    events = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=500
+    )
+
+    def validate_events(self, value):
+        """Drops repeated ids, keeping the order they were sent in"""
+        return list(dict.fromkeys(value))
+
+class EventFilterSerializer(serializers.Serializer):
+    """
+    Validates the query parameters that filter and order the event list.
+    Every combination is served from one of the (…, date, time, id) indexes of Event.
+    """
+    date_after = serializers.DateField(required=False)
+    date_before = serializers.DateField(required=False)
+    game = serializers.IntegerField(required=False, min_value=1)
+    game_type = serializers.IntegerField(required=False, min_value=1)
+    organizer = serializers.IntegerField(required=False, min_value=1)
+    joined = serializers.BooleanField(required=False)
+    upcoming = serializers.BooleanField(required=False)
+    ordering = serializers.ChoiceField(choices=['date', '-date'], required=False)
+
+    ORDERINGS = {
+        'date': ('date', 'time', 'id'),
+        '-date': ('-date', '-time', '-id'),
+    }
+
+    def __init__(self, query_params, **kwargs):
+        # A plain dict, so missing booleans are skipped instead of read as unchecked checkboxes
+        super().__init__(data=query_params.dict(), **kwargs)
+
+    def filter_queryset(self, queryset, gamer):
+        """Applies the validated filters to queryset, with joined relative to gamer"""
+        filters = self.validated_data
+        if 'date_after' in filters:
+            queryset = queryset.filter(date__gte=filters['date_after'])
+        if 'date_before' in filters:
+            queryset = queryset.filter(date__lte=filters['date_before'])
+        if 'game' in filters:
+            queryset = queryset.filter(game_id=filters['game'])
+        if 'game_type' in filters:
+            queryset = queryset.filter(game__game_type_id=filters['game_type'])
+        if 'organizer' in filters:
+            queryset = queryset.filter(organizer_id=filters['organizer'])
+        if 'joined' in filters:
+            queryset = queryset.joined_by(gamer, filters['joined'])
+        if filters.get('upcoming'):
+            queryset = queryset.upcoming(timezone.localdate())
+        if 'ordering' in filters:
+            # Without ?ordering= the full list keeps coming back in the order it always did
+            queryset = queryset.order_by(*self.order_by)
+        return queryset
+
+    @property
+    def order_by(self):
+        """The fields the list is ordered (and paginated) by"""
+        return self.ORDERINGS[self.validated_data.get('ordering', 'date')]
+
 class CreateEventSerializer(serializers.ModelSerializer):
     class Meta:
         model = Event
         fields = ['id', 'game', 'description', 'date', 'time', 'organizer']
 
+class UpdateEventSerializer(serializers.Serializer):
+    """
+    Validates the body of PUT and PATCH /events/<pk> (the keys the client sends) and maps it to
+    the columns to update. The game and organizer are checked to exist without loading them.
+    """
+    description = serializers.CharField(max_length=50)
+    date = serializers.DateField()
+    time = serializers.TimeField()
+    game = serializers.IntegerField()
+    userId = serializers.CharField()
+
+    def validate_game(self, value):
+        if not Game.objects.filter(pk=value).exists():
+            raise serializers.ValidationError('Game not found.')
+        return value
+
+    def validate_userId(self, value):
+        organizer_id = Gamer.objects.filter(uid=value).values_list('id', flat=True).first()
+        if organizer_id is None:
+            raise serializers.ValidationError('Gamer not found.')
+        return organizer_id
+
+    COLUMNS = {'description': 'description', 'date': 'date', 'time': 'time', 'game': 'game_id', 'userId': 'organizer_id'}
+
+    @property
+    def changes(self):
+        """The validated fields as {column: value}"""
+        return {self.COLUMNS[name]: value for name, value in self.validated_data.items()}
+
+DATE_FORMAT = "%B %d, %Y"
+TIME_FORMAT = "%I:%M %p"
+
+class EventGameSerializer(serializers.ModelSerializer):
+    """JSON serializer for the game embedded in an event, without the game's stored counters"""
+    class Meta:
+        model = Game
+        fields = ('id', 'title', 'maker', 'number_of_players', 'skill_level', 'game_type', 'gamer')
+        depth = 1
+
 class EventSerializer(serializers.ModelSerializer):
     """JSON serializer for events
     """
+    game = EventGameSerializer(read_only=True)
     attendees_count = serializers.IntegerField(default=None)
-    time = serializers.TimeField(format="%I:%M %p")
-    date = serializers.DateField(format="%B %d, %Y")
+    time = serializers.TimeField(format=TIME_FORMAT)
+    date = serializers.DateField(format=DATE_FORMAT)
     class Meta:
         model = Event
         fields = ('id', 'game', 'description', 'date', 'time', 'organizer', 'joined', 'attendees_count')
         depth = 2
+
+class FlatEventSerializer(FlatSerializer):
+    """Renders the same JSON as EventSerializer from .values() rows of with_attendance() events"""
+    fields = {
+        'id': Field(),
+        'game': Relation(
+            title=Field(),
+            maker=Field(),
+            number_of_players=Field(),
+            skill_level=Field(),
+            game_type=Relation(label=Field()),
+            gamer=Relation(uid=Field(), bio=Field()),
+        ),
+        'description': Field(),
+        'date': Field(output_format=DATE_FORMAT),
+        'time': Field(output_format=TIME_FORMAT),
+        'organizer': Relation(uid=Field(), bio=Field()),
+        'joined': Field(),
+        'attendees_count': Field(),
+    }
@@ -1,10 +1,17 @@
 from rest_framework.viewsets import ViewSet
 from rest_framework.response import Response
 from rest_framework import serializers, status
-from rest_framework.serializers import ModelSerializer
-from levelupapi.models import Game, Gamer, GameType, Event
-from django.db.models import Count, Q
-from django.core.exceptions import ValidationError
+from rest_framework.exceptions import NotFound
+from levelupapi.models import Game, GameType, Event
+from levelupapi.pagination import KeysetPagination
+from levelupapi.streaming import Export, export_format
+from levelupapi.authentication import current_gamer
+from levelupapi.cache import bump_dashboards, bump_version, not_modified, version_etag
+from levelupapi.concurrency import row_etag, update_row
+from levelupapi import deletion, search, seating
+from levelupapi.flat import Field, FlatSerializer, Relation
+from django.utils.cache import patch_vary_headers
+from django.db import transaction
 
 class GameView(ViewSet):
     """Game view set"""
@@ -14,7 +21,7 @@ class GameView(ViewSet):
       Returns
         Response -- JSON serialized game instance
       """
-      gamer = Gamer.objects.get(uid=request.META['HTTP_AUTHORIZATION'])
+      gamer = current_gamer(request)
       serializer = CreateGameSerializer(data=request.data)
       serializer.is_valid(raise_exception=True)
       serializer.save(gamer=gamer)
@@ -39,52 +46,84 @@ class GameView(ViewSet):
         """GET requests for single game
         Returns JSON serialized game"""
         try:
-            game = Game.objects.get(pk=pk)
+            game = Game.objects.with_related().get(pk=pk)
             serializer = GameSerializer(game)
-            return Response(serializer.data)
+            # the version the client sends back in If-Match when editing the game
+            return Response(serializer.data, headers={'ETag': row_etag(game.version)})
         except Game.DoesNotExist as ex:
             return Response({'message': ex.args[0]}, status=status.HTTP_404_NOT_FOUND)
 
     def list(self, request):
         """GET requests for all games
         Returns JSON serialized list of games"""
-        uid = request.META['HTTP_AUTHORIZATION']
-        gamer = Gamer.objects.get(uid=uid)
-        games = Game.objects.annotate(event_count=Count(
-            'events'), user_event_count=Count('events', filter=Q(events__organizer=gamer)))
+        gamer = current_gamer(request)
+        # answers with 304 before running any query when nothing changed since the client's last poll
+        etag = version_etag('games', 'list', gamer.id, request.get_full_path())
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        # ?fields= and ?expand= pick the fields and embedded relations to render (all of them by default)
+        serializer = FlatGameSerializer.from_query_params(request.query_params)
+        # with_event_counts() counts all events of each game and the ones organized by the gamer
+        # serializer.values() fetches only the columns, joins and counts behind the selected fields as plain dicts
+        games = serializer.values(Game.objects.with_event_counts(gamer), 'id')
         
         # filters games based on game type
         game_type = request.query_params.get('type', None)
         if game_type is not None:
             games = games.filter(game_type_id=game_type)
-        
-        serializer = GameSerializer(games, many=True)
-        return Response(serializer.data)
+
+        # ?export=json or ?export=ndjson streams every matching game instead of building the whole body
+        fmt = export_format(request.query_params)
+        if fmt is not None:
+            response = Export(serializer, games, fmt).response()
+        else:
+            # keyset pagination over id when the client asks for pages
+            paginator = KeysetPagination(ordering=('id',))
+            page = paginator.paginate_queryset(games, request, view=self)
+            rows = page if page is not None else list(games)
+            serializer.load(rows)
+            if page is not None:
+                response = paginator.get_paginated_response(serializer.serialize(rows))
+            else:
+                response = Response(serializer.serialize(rows))
+
+        # the body depends on who asks (user_event_count), so shared caches must key on the Authorization header too
+        response['ETag'] = etag
+        patch_vary_headers(response, ['Authorization'])
+        return response
   
     def update(self, request, pk):
         """Handle PUT requests for a game
 
         Returns:
-        Response -- Empty body with 204 status code
+        Response -- Empty body with 204 status code, and the new version of the game as its ETag
         """
+        serializer = UpdateGameSerializer(data=request.data, partial=request.method == 'PATCH')
+        serializer.is_valid(raise_exception=True)
 
-        # client is sending info to be updated in the database
-        game = Game.objects.get(pk=pk)
-        game.title = request.data["title"]
-        game.maker = request.data["maker"]
-        game.number_of_players = request.data["numberOfPlayers"]
-        game.skill_level = request.data["skillLevel"]
+        # one UPDATE of the changed columns, refused (412) when If-Match names an older version
+        with transaction.atomic():
+            row = update_row(Game, pk, serializer.changes, request, read=('gamer_id',))
+            if 'number_of_players' in serializer.changes:
+                # more seats go to the gamers waiting for the game's events
+                seating.promote_waitlist(Event.objects.filter(game_id=pk).values_list('id', flat=True))
+            # a queryset update skips the signals that invalidate the lists embedding the game
+            bump_version('events', 'games')
+            bump_dashboards(row['gamer_id'])
+            if {'title', 'maker'} & set(serializer.changes):
+                search.reindex(Game, [pk])
 
-        game_type = GameType.objects.get(pk=request.data["gameType"])
-        game.game_type = game_type
-        game.save()
+        return Response(None, status=status.HTTP_204_NO_CONTENT, headers={'ETag': row_etag(row['version'] + 1)})
 
-        return Response(None, status=status.HTTP_204_NO_CONTENT)
+    def partial_update(self, request, pk):
+        """Handle PATCH requests for a game: updates only the fields sent"""
+        return self.update(request, pk)
     
     def destroy(self, request, pk):
-        """DELETE Game"""
-        game = Game.objects.get(pk=pk)
-        game.delete()
+        """DELETE Game, with its events and their memberships, without loading them (see levelupapi.deletion)"""
+        if not deletion.delete_games([pk]):
+            raise NotFound('No game matches the given query.')
         return Response(None, status=status.HTTP_204_NO_CONTENT)
         
 class CreateGameSerializer(serializers.ModelSerializer):
@@ -92,6 +131,32 @@ class CreateGameSerializer(serializers.ModelSerializer):
         model = Game
         fields = ['id', 'title', 'maker', 'number_of_players', 'skill_level', 'game_type']
 
+class UpdateGameSerializer(serializers.Serializer):
+    """
+    Validates the body of PUT and PATCH /games/<pk> (the keys the client sends) and maps it to
+    the columns to update. The game type is checked to exist without loading it.
+    """
+    title = serializers.CharField(max_length=50)
+    maker = serializers.CharField(max_length=50)
+    numberOfPlayers = serializers.IntegerField()
+    skillLevel = serializers.IntegerField()
+    gameType = serializers.IntegerField()
+
+    def validate_gameType(self, value):
+        if not GameType.objects.filter(pk=value).exists():
+            raise serializers.ValidationError('Game type not found.')
+        return value
+
+    COLUMNS = {
+        'title': 'title', 'maker': 'maker', 'numberOfPlayers': 'number_of_players',
+        'skillLevel': 'skill_level', 'gameType': 'game_type_id',
+    }
+
+    @property
+    def changes(self):
+        """The validated fields as {column: value}"""
+        return {self.COLUMNS[name]: value for name, value in self.validated_data.items()}
+
 class GameSerializer(serializers.ModelSerializer):
     """JSON serializer for games"""
     event_count = serializers.IntegerField(default=None)
@@ -102,3 +167,48 @@ class GameSerializer(serializers.ModelSerializer):
         depth = 2
 
         
+
+class FlatGameSerializer(FlatSerializer):
+    """
+    Renders the same JSON as GameSerializer from .values() rows of with_event_counts() games.
+    The event_info of each game is passed in context['event_info'], see group_event_info().
+    """
+    fields = {
+        'id': Field(),
+        'game_type': Relation(label=Field()),
+        'title': Field(),
+        'maker': Field(),
+        'gamer': Relation(uid=Field(), bio=Field()),
+        'number_of_players': Field(),
+        'skill_level': Field(),
+        'event_count': Field(),
+        'event_info': Field(method=True, columns=('id',)),
+        'user_event_count': Field(),
+    }
+
+    @staticmethod
+    def event_info_rows(rows):
+        """Returns the (game id, description, date, time) rows of the events of the games in rows"""
+        return Event.objects.filter(game_id__in=[row['id'] for row in rows]).values_list(
+            'game_id', 'description', 'date', 'time')
+
+    @staticmethod
+    def group_event_info(event_rows):
+        """Builds {game id: event_info} from the rows of event_info_rows()"""
+        event_info = {}
+        for game_id, *summary in event_rows:
+            event_info.setdefault(game_id, []).extend(summary)
+        return event_info
+
+    def load(self, rows):
+        # the events behind event_info are fetched for all rows in a single query
+        if self.selects('event_info'):
+            self.context['event_info'] = self.group_event_info(self.event_info_rows(rows))
+
+    async def aload(self, rows):
+        if self.selects('event_info'):
+            self.context['event_info'] = self.group_event_info(
+                [row async for row in self.event_info_rows(rows)])
+
+    def get_event_info(self, row):
+        return self.context['event_info'].get(row['id'], [])
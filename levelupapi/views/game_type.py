@@ -4,6 +4,7 @@ from rest_framework.viewsets import ViewSet
 from rest_framework.response import Response
 from rest_framework import serializers, status
 from levelupapi.models import GameType
+from levelupapi.cache import cached_data, not_modified, version_etag
 
 
 class GameTypeView(ViewSet):
@@ -21,13 +22,20 @@ class GameTypeView(ViewSet):
         Returns:
             Response: A serialized GameType instance if found, otherwise a 404 error.
         """
+        # Answer with 304 when the client already has the current version of this game type
+        etag = version_etag('gametypes', 'retrieve', pk)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
         try:
-            # Attempt to get the GameType instance with the given primary key
-            game_type = GameType.objects.get(pk=pk)
-            # Serialize the retrieved GameType instance
-            serializer = GameTypeSerializer(game_type)
+            # Serialize the GameType instance with the given primary key, unless it's already cached
+            data = cached_data(
+                'gametypes', f'retrieve:{pk}',
+                lambda: GameTypeSerializer(GameType.objects.get(pk=pk)).data
+            )
             # Return the serialized GameType data as a JSON response
-            return Response(serializer.data)
+            return Response(data, headers={'ETag': etag})
         except GameType.DoesNotExist as ex:
             # If the GameType instance with the given primary key does not exist, return a 404 error
             return Response({'message': ex.args[0]}, status=status.HTTP_404_NOT_FOUND)
@@ -42,13 +50,20 @@ class GameTypeView(ViewSet):
         Returns:
             Response: A serialized list of game types as a JSON response.
         """
-        # Get all GameType instances
-        game_types = GameType.objects.all()
-        # Serialize the retrieved GameType instances with the `GameTypeSerializer`
+        # Answer with 304 when the client already has the current version of the list
+        etag = version_etag('gametypes', 'list')
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        # Serialize all GameType instances with the `GameTypeSerializer`, unless they're already cached
         # Pass the `many=True` argument to indicate that the serializer should handle multiple instances
-        serializer = GameTypeSerializer(game_types, many=True)
+        data = cached_data(
+            'gametypes', 'list',
+            lambda: GameTypeSerializer(GameType.objects.all(), many=True).data
+        )
         # Return the serialized game types as a JSON response
-        return Response(serializer.data)
+        return Response(data, headers={'ETag': etag})
 
 class GameTypeSerializer(serializers.ModelSerializer):
     """
@@ -0,0 +1,14 @@
+"""View module for exposing the request metrics"""
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from levelupapi.middleware import metrics
+
+
+@require_GET
+def metrics_view(request):
+    '''Serves the totals collected by QueryTimingMiddleware in the Prometheus text format
+
+    Method arguments:
+      request -- The full HTTP request object
+    '''
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,51 @@
+"""View module for searching games and events"""
+from rest_framework import serializers
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+from levelupapi.search import DOCUMENTS, get_backend
+from levelupapi.views.event import FlatEventSerializer
+from levelupapi.views.game import FlatGameSerializer
+
+RESULT_SERIALIZERS = {
+    'games': lambda: FlatGameSerializer(
+        fields=['id', 'title', 'maker', 'game_type', 'number_of_players', 'skill_level'], expand=['game_type']),
+    'events': lambda: FlatEventSerializer(
+        fields=['id', 'description', 'date', 'time', 'game', 'organizer', 'attendees_count'], expand=['game']),
+}
+"""The fields rendered for the games and events found"""
+
+
+class SearchSerializer(serializers.Serializer):
+    """Validates the query parameters of /search"""
+    # a single character matches too many rows to rank them in typeahead time
+    q = serializers.CharField(min_length=2, max_length=100, trim_whitespace=True)
+    type = serializers.ChoiceField(choices=list(DOCUMENTS), required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+    def __init__(self, query_params, **kwargs):
+        super().__init__(data=query_params.dict(), **kwargs)
+
+
+@api_view(['GET'])
+def search_view(request):
+    '''Finds the games (by title or maker) and events (by description) matching ?q=, best match first
+
+    The last word of q matches as a prefix, so the endpoint can answer typeahead as the user types.
+    ?type=games or ?type=events searches only one of them, ?limit= caps the results of each (10 by default).
+
+    Method arguments:
+      request -- The full HTTP request object
+    '''
+    params = SearchSerializer(request.query_params)
+    params.is_valid(raise_exception=True)
+    kinds = [params.validated_data['type']] if 'type' in params.validated_data else list(DOCUMENTS)
+    ranked = get_backend().search(
+        params.validated_data['q'], [DOCUMENTS[kind] for kind in kinds], params.validated_data['limit'])
+
+    data = {}
+    for kind in kinds:
+        serializer = RESULT_SERIALIZERS[kind]()
+        model = DOCUMENTS[kind].model
+        rows = {row['id']: row for row in serializer.values(model.objects.filter(pk__in=ranked[kind]), 'id')}
+        data[kind] = serializer.serialize([rows[pk] for pk in ranked[kind] if pk in rows])
+    return Response(data)